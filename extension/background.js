@@ -36,6 +36,10 @@ async function sendToProcess(details) {
     contentType: 'text/uri-list',
     body: details.url,
   };
+  if (details.progressVersion) {
+    // Let server skip resending data we already have
+    params.headers['Progress-Version'] = details.progressVersion;
+  }
   for (const name of ['Content-Location', 'Location']) {
     const header = details.responseHeaders.find(
       _header => _header.name.toLowerCase() === name.toLowerCase()
@@ -194,6 +198,7 @@ function responseHandler(details) {
   }
 
   details.path = path;
+  details.progressVersion = riddle.progressVersion;
   if (details.type === 'main_frame') {
     updateCurrentRiddleAndLevel(riddle, path);
   }
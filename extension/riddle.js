@@ -76,8 +76,24 @@ export async function refreshRiddleData(alias, data) {
   if (!data.setName || !data.levelName) {
     // Not a valid level page; nothing more to be done
     return;
-  }  
-  buildRiddle(data.riddleData, data.pagesData);
+  }
+  if (data.unchanged) {
+    // Riddle/pages data still up to date; keep current one
+    return;
+  }
+  let pages = data.pagesData;
+  if (data.changedPagesData) {
+    // Only pages of changed levels were sent; keep the other ones
+    pages = {};
+    for (const level of Object.values(riddles[alias]?.levels ?? {})) {
+      if (level.pages) {
+        pages[level.name] = level.pages;
+      }
+    }
+    Object.assign(pages, data.changedPagesData);
+  }
+  data.riddleData.progressVersion = data.progressVersion;
+  buildRiddle(data.riddleData, pages);
 }
 
 /** Update extension's action icon based on active tab. */
@@ -19,39 +19,126 @@ async def has_player_mastered_riddle(alias: str, username: str) -> bool:
         values = {'alias': alias}
         return bool(await database.fetch_val(query, values))
 
-    async def _has_player_beaten_all_levels() -> bool:
-        query = f"""
-            SELECT 1 FROM levels lv
-            WHERE riddle = :riddle
-                AND (
-                    rank != 'F' OR name IN (
-                        SELECT final_level FROM riddles r
-                        WHERE lv.riddle = r.alias
-                    )    
-                ) AND name NOT IN (
-                    SELECT level_name FROM user_levels
-                    WHERE riddle = :riddle AND username = :username
-                        AND completion_time IS NOT NULL
-                        {'AND incognito_solve IS NOT TRUE' if not is_session_user else ''}
-                )
-        """
-        values = {'riddle': alias, 'username': username}
-        return await database.fetch_val(query, values) is None
-
-    async def _has_player_unlocked_all_cheevos() -> bool:
-        query = f"""
-            SELECT 1 FROM achievements
-            WHERE riddle = :riddle AND title NOT IN (
-                SELECT title FROM user_achievements
-                WHERE riddle = :riddle AND username = :username
-                {'AND incognito IS NOT TRUE' if not is_session_user else ''}
-            )
-        """
+    async def _get_remaining_counts() -> dict | None:
+        query = '''
+            SELECT * FROM riddle_accounts
+            WHERE riddle = :riddle AND username = :username
+        '''
         values = {'riddle': alias, 'username': username}
-        return await database.fetch_val(query, values) is None
+        racc = await database.fetch_one(query, values)
+        if racc and racc['levels_remaining'] is None:
+            # Counts not yet computed for player; count and store them
+            await recount_mastery_counts(alias, username, missing_only=True)
+            racc = await database.fetch_one(query, values)
+        return racc
 
+    if not (racc := await _get_remaining_counts()):
+        return False
+
+    # Incognito progress only counts for the player themself
+    prefix = '' if is_session_user else 'visible_'
     return (
-        await _is_final_level_up()
-        and await _has_player_beaten_all_levels()
-        and await _has_player_unlocked_all_cheevos()
+        racc[f"{prefix}levels_remaining"] == 0
+        and racc[f"{prefix}cheevos_remaining"] == 0
+        and await _is_final_level_up()
     )
+
+
+def _remaining_levels(visible_only: bool) -> str:
+    '''Subquery counting player's remaining ranked/final levels.'''
+    return f"""(
+        SELECT COUNT(*) FROM levels lv
+        WHERE lv.riddle = ra.riddle
+            AND (
+                rank != 'F' OR name IN (
+                    SELECT final_level FROM riddles r
+                    WHERE lv.riddle = r.alias
+                )
+            ) AND name NOT IN (
+                SELECT level_name FROM user_levels ul
+                WHERE ul.riddle = ra.riddle AND ul.username = ra.username
+                    AND completion_time IS NOT NULL
+                    {'AND incognito_solve IS NOT TRUE' if visible_only else ''}
+            )
+    )"""
+
+
+def _remaining_cheevos(visible_only: bool) -> str:
+    '''Subquery counting player's remaining cheevos.'''
+    return f"""(
+        SELECT COUNT(*) FROM achievements ach
+        WHERE ach.riddle = ra.riddle AND title NOT IN (
+            SELECT title FROM user_achievements ua
+            WHERE ua.riddle = ra.riddle AND ua.username = ra.username
+                {'AND incognito IS NOT TRUE' if visible_only else ''}
+        )
+    )"""
+
+
+async def recount_mastery_counts(
+    alias: str | None = None,
+    username: str | None = None,
+    missing_only: bool = False,
+):
+    '''
+    Recount riddle levels and cheevos remaining for mastery,
+    both overall and ignoring incognito progress,
+    for the given player (or else every riddle player).
+        :param alias: Riddle to recount (if not given, all of them).
+        :param missing_only: Whether to only count players
+            whose counts haven't been computed yet (i.e are NULL).
+    '''
+
+    conditions = ['TRUE']
+    values = {}
+    if alias:
+        conditions.append('riddle = :riddle')
+        values['riddle'] = alias
+    if username:
+        conditions.append('username = :username')
+        values['username'] = username
+    if missing_only:
+        conditions.append('levels_remaining IS NULL')
+    query = f"""
+        UPDATE riddle_accounts ra
+        SET levels_remaining = {_remaining_levels(False)},
+            visible_levels_remaining = {_remaining_levels(True)},
+            cheevos_remaining = {_remaining_cheevos(False)},
+            visible_cheevos_remaining = {_remaining_cheevos(True)}
+        WHERE {' AND '.join(conditions)}
+    """
+    await database.execute(query, values)
+
+
+async def decrement_mastery_count(
+    alias: str, username: str, kind: str, incognito: bool
+):
+    '''
+    Account for a new ranked level solve or cheevo unlock by player.
+        :param kind: Either `'levels'` or `'cheevos'`.
+        :param incognito: Whether progress was made in incognito mode
+            (i.e hidden from other players).
+    '''
+    # (counts are unsigned, so never let them go below 0 even if stale)
+    updates = [
+        f"{kind}_remaining = "
+        f"IF({kind}_remaining > 0, {kind}_remaining - 1, 0)"
+    ]
+    if not incognito:
+        updates.append(
+            f"visible_{kind}_remaining = IF("
+            f"visible_{kind}_remaining > 0, visible_{kind}_remaining - 1, 0"
+            ')'
+        )
+    query = f"""
+        UPDATE riddle_accounts
+        SET {', '.join(updates)}
+        WHERE riddle = :riddle
+            AND username = :username
+            AND {kind}_remaining IS NOT NULL
+    """
+    values = {'riddle': alias, 'username': username}
+    if not await database.execute(query, values):
+        # Counts not computed yet (or account missing); count them all
+        # (progress being already recorded, the new one is accounted for)
+        await recount_mastery_counts(alias, username, missing_only=True)
@@ -3,6 +3,7 @@ import hashlib
 from pathlib import Path
 from typing import Self
 
+from indexes import canonical_paths
 from util.db import database
 
 
@@ -100,6 +101,9 @@ class PageSnapshot:
         values |= {'retrieval_time': self.retrieval_time}
         await database.execute(query, values)
 
+        # Paths may have been canonicalized based on the old content
+        await canonical_paths.invalidate(self.alias)
+
         return True
 
     def save(self):
@@ -5,9 +5,11 @@ from quartcord import requires_authorization
 
 from admin.admin_auth import admin_auth
 from admin.util import save_image
+from indexes import cheevo_index, page_index
 from inject import get_achievements
 from webclient import bot_request
 from util.db import database
+from util.riddle import recount_mastery_counts
 
 # Create app blueprint
 admin_cheevos = Blueprint('admin_cheevos', __name__)
@@ -102,6 +104,7 @@ async def manage_cheevos(alias: str):
             '''
             values = {'riddle': alias, 'path': path}
             await database.execute(query, values)
+        await page_index.invalidate(alias)
 
         # Insert new level data on database
         query = '''
@@ -125,6 +128,12 @@ async def manage_cheevos(alias: str):
         # mastered statuses from players.
         await bot_request('insert', alias=alias)
 
+    # Have cached cheevo data reloaded
+    await cheevo_index.invalidate(alias)
+
+    # Cheevos may have been added, so recount what's left for mastery
+    await recount_mastery_counts(alias)
+
     # Fetch cheevos again to display page correctly on POST
     cheevos = await get_achievements(alias)
     k = 1
@@ -13,7 +13,8 @@ from quartcord import requires_authorization
 
 from admin.admin_auth import admin_auth
 from admin.archive import PageSnapshot
-from credentials import get_path_credentials
+from credentials import get_path_credentials, get_paths_credentials
+from indexes import page_index
 from inject import get_riddle
 from levels import absolute_paths, get_pages, listify
 from process import is_trivial_redirect, process_url
@@ -64,6 +65,16 @@ async def health_diagnostics(alias: str, background: bool = False):
     start_level = args.get('start')
     end_level = args.get('end')
 
+    # Resolve every page's credentials at once
+    page_credentials = await get_paths_credentials(
+        alias,
+        [
+            path
+            for level in all_pages_by_level.values()
+            for path, _ in absolute_paths(level['/'])
+        ],
+    )
+
     async def _retrieve_page(
         path: str, page_data: dict, include_level: bool,
     ) -> dict:
@@ -162,7 +173,10 @@ async def health_diagnostics(alias: str, background: bool = False):
 
         url = f"{riddle['root_path']}{path}"
 
-        credentials = await get_path_credentials(alias, path)
+        credentials = page_credentials.get(path)
+        if not credentials:
+            # Path outside page list (e.g redirect target)
+            credentials = await get_path_credentials(alias, path)
         username = credentials['username'] or ''
         password = credentials['password'] or ''
         if riddle['alias'] == 'notpron' and path.startswith('/jerk2'):
@@ -365,6 +379,9 @@ async def health_diagnostics(alias: str, background: bool = False):
 
         include_level &= not name == end_level
 
+    # Have cached page data (e.g status codes) reloaded
+    await page_index.invalidate(alias)
+
     # TODO
     # Retroactively grant user records for non-demo riddles; temp-fix for now
     query = '''
@@ -6,8 +6,11 @@ from quartcord import requires_authorization
 
 from admin.admin_auth import admin_auth
 from admin.util import save_image
+from indexes import level_index
+from progress import bump_riddle_progress_versions
 from levels import get_pages
 from util.db import database
+from util.riddle import recount_mastery_counts
 
 # Create app blueprint
 admin_levels = Blueprint('admin_levels', __name__)
@@ -57,6 +60,9 @@ async def manage_levels(alias: str):
 
     # Update levels
     await _update_levels(alias, form)
+    await level_index.invalidate(alias)
+    await recount_mastery_counts(alias)
+    await bump_riddle_progress_versions(alias)
     
     # Fetch levels again (to correctly display page on POST)
     levels = await _fetch_levels(alias)
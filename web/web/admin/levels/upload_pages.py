@@ -10,7 +10,9 @@ import requests
 
 from admin.admin_auth import admin_auth
 from admin.levels.updater import LevelUpdater
+from indexes import level_index, page_index
 from util.db import database
+from util.riddle import recount_mastery_counts
 
 # Create app blueprint
 admin_upload_pages = Blueprint('admin_upload_pages', __name__)
@@ -62,6 +64,13 @@ async def upload_pages(alias: str):
             # Add requirement and previous answer, if suitable
             await lu.chain_to_previous_level()
 
+    # Have cached page and level data reloaded
+    await page_index.invalidate(alias)
+    await level_index.invalidate(alias)
+
+    # Levels may have been added, so recount what's left for mastery
+    await recount_mastery_counts(alias)
+
     return 'OK', 200
 
 
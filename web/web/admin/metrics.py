@@ -0,0 +1,19 @@
+from quart import Blueprint
+from quartcord import requires_authorization
+
+from admin.admin_auth import root_auth
+from metrics import stage_timings
+
+admin_metrics = Blueprint('admin_metrics', __name__)
+
+
+@admin_metrics.get('/admin/metrics')
+@requires_authorization
+async def metrics():
+    '''Expose `/process` stage timings (of all workers) to Prometheus.'''
+
+    await root_auth()
+
+    return await stage_timings.render(), 200, {
+        'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'
+    }
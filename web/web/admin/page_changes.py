@@ -7,6 +7,8 @@ from quart import Blueprint
 from quartcord import requires_authorization
 
 from admin.admin_auth import admin_auth
+from indexes import cheevo_index, level_index, page_index
+from progress import bump_riddle_progress_versions
 from util.db import database
 
 admin_page_changes = Blueprint('admin_page_changes', __name__)
@@ -115,19 +117,26 @@ async def apply_page_changes(alias: str):
         is_glob = bool(set('*?{}') & set(page_change['path']))
         (single_changes, glob_changes)[is_glob].append(page_change)
 
-    # Apply single changes
-    for single_change in single_changes:
-        await _apply_change(single_change)
-        processed_paths.add(single_change['path'])
-
-    # Apply glob changes, iterating in `most specific -> most general` order
-    for glob_change in reversed(glob_changes):
-        if {'*', '?'} & set(glob_change['path']):
-            _log_glob_change('wildcard', glob_change)
-            await _handle_wildcards(glob_change)
-        elif {'{', '}'} & set(glob_change['path'] or glob_change['new_path']):
-            _log_glob_change('tokenized', glob_change)
-            await _handle_tokens(glob_change)
+    try:
+        # Apply single changes
+        for single_change in single_changes:
+            await _apply_change(single_change)
+            processed_paths.add(single_change['path'])
+
+        # Apply glob changes, in `most specific -> most general` order
+        for glob_change in reversed(glob_changes):
+            if {'*', '?'} & set(glob_change['path']):
+                _log_glob_change('wildcard', glob_change)
+                await _handle_wildcards(glob_change)
+            elif {'{', '}'} & set(glob_change['path'] or glob_change['new_path']):
+                _log_glob_change('tokenized', glob_change)
+                await _handle_tokens(glob_change)
+    finally:
+        # Have cached data reloaded (even on partial changes)
+        await page_index.invalidate(alias)
+        await level_index.invalidate(alias)
+        await cheevo_index.invalidate(alias)
+        await bump_riddle_progress_versions(alias)
 
     return 'SUCCESS :)', 200
 
@@ -5,10 +5,18 @@ from quartcord import requires_authorization
 import requests
 
 from admin.admin_auth import admin_auth, root_auth
+from counters import (
+    get_counter_shards,
+    subtract_counter_shards,
+    LEVEL_COMPLETIONS,
+)
+from credentials import auth_probes, credential_realms
 from inject import get_accounts, get_riddles
+from progress import bump_riddle_progress_versions
 from riddles import level_ranks, cheevo_ranks
 from util.db import database
 from util.levels import get_ancestor_levels
+from util.riddle import recount_mastery_counts
 from webclient import bot_request
 
 # Create app blueprint
@@ -57,6 +65,7 @@ async def update_all(alias: str):
         update_scores,
         update_current_levels,
         update_completion_counts, update_page_counts,
+        update_mastery_counts,
         update_user_credentials, update_ratings,
     )
     for update in update_methods:
@@ -126,6 +135,9 @@ async def update_scores(alias: str):
             values |= {'score': _score}
             await database.execute(query, values)
 
+    # Have cached player progress reloaded
+    await bump_riddle_progress_versions(alias)
+
     return 'SUCCESS :)', 200
 
 
@@ -202,6 +214,9 @@ async def update_current_levels(alias: str):
             values |= {'current_level': _current_level}
             await database.execute(query, values)
 
+    # Have cached player progress reloaded
+    await bump_riddle_progress_versions(alias)
+
     return 'SUCCESS :)', 200
 
 
@@ -213,28 +228,49 @@ async def update_completion_counts(alias: str):
     # Check for admin permissions
     await admin_auth(alias)
 
-    # Get list of levels and completion counts
-    query = '''
-        SELECT level_name, COUNT(*) AS count FROM user_levels
-        WHERE riddle = :riddle
-            AND completion_time IS NOT NULL
-            AND incognito_solve IS NOT TRUE
-        GROUP BY level_name
-    '''
-    levels = await database.fetch_all(query, {'riddle': alias})
+    # Read shards and recount from the same snapshot, so that solves
+    # landing meanwhile are kept as increments
+    async with database.transaction():
+        shards = await get_counter_shards(LEVEL_COMPLETIONS, alias)
 
-    # Update completion count for all riddle levels
-    for level in levels:
+        # Get list of levels and completion counts
         query = '''
-            UPDATE levels
-            SET completion_count = :count
-            WHERE riddle = :riddle AND name = :level
+            SELECT level_name, COUNT(*) AS count FROM user_levels
+            WHERE riddle = :riddle
+                AND completion_time IS NOT NULL
+                AND incognito_solve IS NOT TRUE
+            GROUP BY level_name
         '''
-        values = {
-            'count': level['count'],
-            'riddle': alias, 'level': level['level_name']
-        }
-        await database.execute(query, values)
+        levels = await database.fetch_all(query, {'riddle': alias})
+
+        # Update completion count for all riddle levels
+        for level in levels:
+            query = '''
+                UPDATE levels
+                SET completion_count = :count
+                WHERE riddle = :riddle AND name = :level
+            '''
+            values = {
+                'count': level['count'],
+                'riddle': alias, 'level': level['level_name']
+            }
+            await database.execute(query, values)
+
+        # Drop increments already accounted for by the recount
+        await subtract_counter_shards(LEVEL_COMPLETIONS, alias, shards)
+
+    return 'SUCCESS :)', 200
+
+
+@admin_update.get('/admin/<alias>/update-mastery-counts')
+@requires_authorization
+async def update_mastery_counts(alias: str):
+    '''Úpdate riddle players' levels/cheevos left for mastery.'''
+
+    # Check for admin permissions
+    await admin_auth(alias)
+
+    await recount_mastery_counts(alias)
 
     return 'SUCCESS :)', 200
 
@@ -279,6 +315,9 @@ async def update_page_counts(alias: str):
             }
             await database.execute(query, values)
 
+    # Have cached player progress reloaded
+    await bump_riddle_progress_versions(alias)
+
     return 'SUCCESS :)', 200
 
 
@@ -293,6 +332,11 @@ async def update_user_credentials(alias: str):
     # Check for admin permissions
     await admin_auth(alias)
 
+    # Credentials may have been edited by hand,
+    # so drop cached realms and HTTP auth probe results
+    await credential_realms.invalidate(alias)
+    await auth_probes.invalidate(alias)
+
     # Get list of riddle credentials, with innermost paths ordered first
     query = '''
         SELECT * FROM riddle_credentials
@@ -351,7 +395,10 @@ async def update_user_credentials(alias: str):
             await database.execute(query, values)
 
         path_previous = path if '.' in path else f"{path}/"
-    
+
+    # Have cached player progress (and unlocked credentials) reloaded
+    await bump_riddle_progress_versions(alias)
+
     return 'SUCCESS :)', 200
 
 
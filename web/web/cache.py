@@ -0,0 +1,151 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Self
+
+from util.db import database
+
+
+class RiddleCache:
+    '''
+    Worker-local cache of DB-derived data, lazily built per riddle
+    (or once for all of them, when no alias is given).
+
+    Invalidations are propagated to the other app workers through the
+    `_cache_versions` table, which is polled at most once per `SYNC_INTERVAL`.
+    '''
+
+    SYNC_INTERVAL = 1.0
+    '''Minimum time (in seconds) between version checks against the DB.'''
+
+    _instances: dict[str, Self] = {}
+    '''All named caches in this worker.'''
+
+    _versions: dict[tuple[str, str], int] = {}
+    '''Last seen `(cache, riddle) -> version` pairs.'''
+
+    _last_sync: float = -SYNC_INTERVAL
+    '''Monotonic time of the last version check.'''
+
+    def __init__(
+        self,
+        name: str,
+        builder: Callable[..., Awaitable[Any]],
+        ttl: float | None = None,
+    ):
+        '''
+        Register named cache.
+            :param builder: Coroutine function for building an entry
+                (receiving the riddle alias, if any).
+            :param ttl: Maximum age (in seconds) of an entry, if applicable
+                (e.g data which can be changed outside the app).
+        '''
+        self.name = name
+        self.ttl = ttl
+        self._builder = builder
+        self._entries: dict[str, tuple[float, Any]] = {}
+        self._generations: dict[str, int] = {}
+        self._locks: dict[str, asyncio.Lock] = {}
+        RiddleCache._instances[name] = self
+
+    async def get(self, alias: str | None = None) -> Any:
+        '''Return (possibly freshly built) cached data.'''
+
+        await RiddleCache._sync()
+
+        key = alias or ''
+        if (value := self._get_fresh(key)) is not None:
+            return value
+
+        # Build entry just once, even on simultaneous cache misses
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            if (value := self._get_fresh(key)) is not None:
+                return value
+            generation = self._generations.get(key, 0)
+            value = await (
+                self._builder(alias) if alias is not None else self._builder()
+            )
+            if self._generations.get(key, 0) == generation:
+                # Don't keep data invalidated while it was being built
+                self._entries[key] = (time.monotonic(), value)
+
+        return value
+
+    def version(self, alias: str | None = None) -> int:
+        '''
+        Return number of (last seen) invalidations of riddle's data,
+        including riddle-less ones.
+        '''
+        return (
+            RiddleCache._versions.get((self.name, alias or ''), 0)
+            + (RiddleCache._versions.get((self.name, ''), 0) if alias else 0)
+        )
+
+    def peek(self, alias: str | None = None) -> Any:
+        '''Return cached data if present (and fresh), or `None` otherwise.'''
+        return self._get_fresh(alias or '')
+
+    async def invalidate(
+        self, alias: str | None = None, others_only: bool = False
+    ):
+        '''
+        Drop cached data, both here and on the other workers.
+            :param others_only: Whether to keep local data
+                (i.e when it has already been updated in place).
+        '''
+
+        key = alias or ''
+        if not others_only:
+            self._drop(key)
+
+        query = '''
+            INSERT INTO _cache_versions (cache, riddle, version)
+            VALUES (:cache, :riddle, 1)
+            ON DUPLICATE KEY UPDATE version = version + 1
+        '''
+        values = {'cache': self.name, 'riddle': key}
+        await database.execute(query, values)
+        query = '''
+            SELECT version FROM _cache_versions
+            WHERE cache = :cache AND riddle = :riddle
+        '''
+        RiddleCache._versions[(self.name, key)] = \
+            await database.fetch_val(query, values)
+
+    def _get_fresh(self, key: str) -> Any:
+        '''Return entry's data unless missing or expired.'''
+        if not (entry := self._entries.get(key)):
+            return None
+        built_time, value = entry
+        if self.ttl and time.monotonic() - built_time > self.ttl:
+            return None
+        return value
+
+    def _drop(self, key: str):
+        '''Drop local entry (and any ongoing build of it).'''
+        if key:
+            self._entries.pop(key, None)
+            self._generations[key] = self._generations.get(key, 0) + 1
+        else:
+            # Riddle-less invalidation; drop every entry
+            for _key in set(self._entries) | set(self._generations):
+                self._generations[_key] = self._generations.get(_key, 0) + 1
+            self._entries.clear()
+
+    @classmethod
+    async def _sync(cls):
+        '''Drop entries invalidated by other workers since last check.'''
+
+        now = time.monotonic()
+        if now - cls._last_sync < cls.SYNC_INTERVAL:
+            return
+        cls._last_sync = now
+
+        query = 'SELECT * FROM _cache_versions'
+        for row in await database.fetch_all(query):
+            key = (row['cache'], row['riddle'])
+            if cls._versions.get(key) == row['version']:
+                continue
+            cls._versions[key] = row['version']
+            if cache := cls._instances.get(row['cache']):
+                cache._drop(row['riddle'])
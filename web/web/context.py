@@ -0,0 +1,49 @@
+from quart import g
+
+from auth import discord, User
+from util.db import database
+
+
+class SessionContext:
+    '''
+    Logged in player's data, resolved at most once per request
+    (and kept in the request's `g` object).
+    '''
+
+    def __init__(self):
+        self._user: User | None = None
+        self._account: dict | None = None
+
+    async def get_user(self) -> User:
+        '''Return Discord OAuth2 user object.'''
+        if self._user is None:
+            self._user = await discord.get_user()
+        return self._user
+
+    async def get_account(self) -> dict | None:
+        '''Return user's row from `accounts`, if any.'''
+        if self._account is None:
+            user = await self.get_user()
+            query = '''
+                SELECT * FROM accounts
+                WHERE username = :username
+            '''
+            account = await database.fetch_one(query, {'username': user.name})
+            self._account = dict(account) if account else {}
+        return self._account or None
+
+    async def is_incognito(self) -> bool:
+        '''Return whether user has incognito mode activated.'''
+        account = await self.get_account()
+        return bool(account and account['incognito'])
+
+    def forget_account(self):
+        '''Drop account row (i.e after it's been updated).'''
+        self._account = None
+
+
+def get_session_context() -> SessionContext:
+    '''Return current request's session context, creating it if needed.'''
+    if 'session_context' not in g:
+        g.session_context = SessionContext()
+    return g.session_context
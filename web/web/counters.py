@@ -0,0 +1,151 @@
+from util.db import database
+
+# Hot counters (e.g riddle hits or level solves) are spread across
+# `SHARD_COUNT` slot rows in `_counter_shards`; writers bump a random slot
+# (so they rarely wait on each other's row locks), while readers sum
+# every slot on top of the counter's base column value.
+# Slots are regularly folded back into the base values (and emptied).
+
+SHARD_COUNT = 16
+'''Number of slot rows per counter.'''
+
+RIDDLE_HITS = 'riddle_hits'
+'''Riddle hit counter (base: `riddles.hit_counter`).'''
+
+LEVEL_COMPLETIONS = 'level_completions'
+'''Level completion counter (base: `levels.completion_count`).'''
+
+_BASE_QUERIES = {
+    RIDDLE_HITS: '''
+        UPDATE riddles SET hit_counter = hit_counter + :value
+        WHERE alias = :riddle
+    ''',
+    LEVEL_COMPLETIONS: '''
+        UPDATE levels SET completion_count = completion_count + :value
+        WHERE riddle = :riddle AND name = :name
+    ''',
+}
+'''Queries adding folded shard values to base columns, by counter.'''
+
+
+async def increment_counters(
+    counter: str, riddle: str, deltas: dict[str, int]
+):
+    '''
+    Increment riddle counters by given deltas.
+        :param deltas: Dict of `name -> delta` pairs
+            (`name` being empty for riddle-wide counters).
+    '''
+    query = f"""
+        INSERT INTO _counter_shards (counter, riddle, name, slot, value)
+        VALUES (:counter, :riddle, :name, FLOOR(RAND() * {SHARD_COUNT}), :delta)
+        ON DUPLICATE KEY UPDATE value = value + VALUES(value)
+    """
+    values = [
+        {'counter': counter, 'riddle': riddle, 'name': name, 'delta': delta}
+        for name, delta in deltas.items()
+    ]
+    await database.execute_many(query, values)
+
+
+async def increment_counter(
+    counter: str, riddle: str, name: str = '', delta: int = 1
+):
+    '''Increment a single riddle counter.'''
+    await increment_counters(counter, riddle, {name: delta})
+
+
+async def get_counter_sums(
+    counter: str, riddle: str | None = None
+) -> dict[tuple[str, str], int]:
+    '''
+    Return summed shard values of counter, possibly for given riddle only
+    (as a dict of `(riddle, name) -> sum` pairs).
+    '''
+    query = f"""
+        SELECT riddle, name, SUM(value) AS total FROM _counter_shards
+        WHERE counter = :counter
+            {'AND riddle = :riddle' if riddle else ''}
+        GROUP BY riddle, name
+    """
+    values = {'counter': counter} | ({'riddle': riddle} if riddle else {})
+    return {
+        (row['riddle'], row['name']): int(row['total'])
+        for row in await database.fetch_all(query, values)
+    }
+
+
+async def get_counter_shards(counter: str, riddle: str) -> list[dict]:
+    '''Return riddle's shard rows (`name`, `slot`, `value`) of counter.'''
+    query = '''
+        SELECT name, slot, value FROM _counter_shards
+        WHERE counter = :counter AND riddle = :riddle
+    '''
+    values = {'counter': counter, 'riddle': riddle}
+    return [dict(row) for row in await database.fetch_all(query, values)]
+
+
+async def subtract_counter_shards(
+    counter: str, riddle: str, shards: list[dict]
+):
+    '''
+    Subtract shard values read before (i.e once folded into base values),
+    keeping any increments made to them since.
+    '''
+    query = '''
+        UPDATE _counter_shards SET value = value - :value
+        WHERE counter = :counter
+            AND riddle = :riddle
+            AND name = :name
+            AND slot = :slot
+    '''
+    values = [
+        {'counter': counter, 'riddle': riddle} | shard for shard in shards
+    ]
+    if values:
+        await database.execute_many(query, values)
+
+
+async def fold_counter_shards(counter: str):
+    '''
+    Add counter's shard values to their base columns and empty the shards
+    (so these don't keep growing, nor do reads keep getting slower).
+    '''
+
+    async with database.transaction():
+        # Lock shards being folded; increments made meanwhile wait for it
+        query = '''
+            SELECT riddle, name, slot, value FROM _counter_shards
+            WHERE counter = :counter AND value != 0
+            FOR UPDATE
+        '''
+        shards = await database.fetch_all(query, {'counter': counter})
+        if not shards:
+            return
+
+        totals = {}
+        for shard in shards:
+            key = (shard['riddle'], shard['name'])
+            totals[key] = totals.get(key, 0) + shard['value']
+        values = [
+            {'riddle': riddle, 'value': value}
+            | ({'name': name} if counter != RIDDLE_HITS else {})
+            for (riddle, name), value in totals.items()
+        ]
+        await database.execute_many(_BASE_QUERIES[counter], values)
+
+        query = '''
+            DELETE FROM _counter_shards
+            WHERE counter = :counter
+                AND riddle = :riddle
+                AND name = :name
+                AND slot = :slot
+        '''
+        values = [
+            {
+                'counter': counter, 'riddle': shard['riddle'],
+                'name': shard['name'], 'slot': shard['slot'],
+            }
+            for shard in shards
+        ]
+        await database.execute_many(query, values)
@@ -1,14 +1,23 @@
+import asyncio
+from collections import OrderedDict
 from datetime import datetime
+import hashlib
 import os
 import re
-
-import requests
-from requests.auth import HTTPBasicAuth
+import time
+from typing import Awaitable, Callable, Iterable
 from urllib.parse import urlsplit
 
-from auth import discord, User
-from players.account import is_user_incognito
+from auth import User
+from cache import RiddleCache
+from context import get_session_context
+from progress import (
+    bump_progress_version,
+    get_player_progress,
+    peek_player_progress,
+)
 from util.db import database
+from webclient import get_auth_status
 
 
 async def process_credentials(
@@ -19,7 +28,7 @@ async def process_credentials(
 ) -> bool:
 
     alias = riddle['alias']
-    user = await discord.get_user()
+    user = await get_session_context().get_user()
     clean_path = path.partition('?')[0]
     credentials_data = await get_path_credentials(alias, clean_path)
     credentials_path = credentials_data['path']
@@ -32,7 +41,7 @@ async def process_credentials(
             credentials_path = \
                 await _check_and_insert_empty_credentials(
                     riddle, user, clean_path
-                )
+                ) or '/'
 
         # User couldn't access path, so nothing more to do
         _log_received_credentials(alias, user, path, credentials_path)
@@ -59,9 +68,15 @@ async def process_credentials(
         return True
 
     # Possibly unseen credentials, so HTTP-investigate and perhaps record them
-    if credentials_path := (
-        await _check_and_record_credentials(riddle, user, clean_path, *credentials)
-    ):
+    try:
+        credentials_path = await _check_and_record_credentials(
+            riddle, user, clean_path, *credentials
+        )
+    except _HostUnavailable:
+        # Can't check credentials right now; as host itself has let
+        # player through (no 401), do likewise without recording anything
+        return True
+    if credentials_path:
         if await _record_user_credentials(alias, credentials_path):
             _log_received_credentials(
                 alias, user, path, credentials_path, *credentials
@@ -71,30 +86,30 @@ async def process_credentials(
     return has_unlocked_credentials
 
 
+class _HostUnavailable(Exception):
+    '''Riddle host couldn't be reached (in time) while probing auth.'''
+
+
 async def _check_and_insert_empty_credentials(
     riddle: dict, user: User, path: str,
-) -> str:
+) -> str | None:
 
     url = f"{riddle['root_path']}{path}"
-    status_code, realm = _send_raw_request(url)
+    status_code, realm = await _probe_auth(riddle['alias'], url)
     if status_code != 401:
-        # 200 masked as 401?
-        return '/'
+        # 200 masked as 401, or unavailable host
+        return None
 
-    while True:
-        credentials_path = path
-        if path == '/' or os.path.basename(path) == '..':
-            break
-        path = os.path.dirname(path)
+    async def _is_same_realm(dir_url: str) -> bool | None:
+        status_code, dir_realm = await _probe_auth(riddle['alias'], dir_url)
+        if status_code is None:
+            return None
+        return (status_code, dir_realm) == (401, realm)
 
-        url = f"{riddle['root_path']}{path}"
-        if path != '/':
-            url += '/'
-        status_code, _realm = _send_raw_request(url)
-        if status_code != 401:
-            break
-        if _realm != realm:
-            break
+    credentials_path = await _find_realm_root(riddle, path, _is_same_realm)
+    if not credentials_path:
+        # Realm root couldn't be told; don't record anything
+        return None
 
     # Insert raw record with unknown (NULL) username/password
     query = '''
@@ -110,6 +125,7 @@ async def _check_and_insert_empty_credentials(
         'realm': realm,
     }
     await database.execute(query, values)
+    await credential_realms.invalidate(riddle['alias'])
     print(
         f"> \033[1m[{riddle['alias']}]\033[0m "
         f"New protected path \033[1;3m{credentials_path}\033[0m "
@@ -125,31 +141,38 @@ async def _check_and_record_credentials(
 ) -> str | None:
 
     url = f"{riddle['root_path']}{path}"
-    if _send_authenticated_request(url, username, password) == 401:
+    authenticated_status = await _send_authenticated_request(
+        riddle['alias'], url, username, password
+    )
+    if authenticated_status is None:
+        raise _HostUnavailable(url)
+    if authenticated_status == 401:
         # Wrong user credentials (leftover, 401 masked as 200, etc)
         return None
 
-    status_code, realm = _send_raw_request(url)
+    status_code, realm = await _probe_auth(riddle['alias'], url)
+    if status_code is None:
+        # Can't tell whether path is still protected
+        raise _HostUnavailable(url)
     if status_code != 401:
         # Credentials removed altogether?
         username = password = ''
 
-    while True:
-        credentials_path = path
-        if path == '/' or os.path.basename(path) == '..':
-            break
-        path = os.path.dirname(path)
+    async def _is_same_realm(dir_url: str) -> bool | None:
+        authenticated_status, raw_status = await asyncio.gather(
+            _send_authenticated_request(
+                riddle['alias'], dir_url, username, password
+            ),
+            _probe_auth(riddle['alias'], dir_url),
+        )
+        if None in (authenticated_status, raw_status[0]):
+            return None
+        return authenticated_status != 401 and raw_status == (401, realm)
 
-        url = f"{riddle['root_path']}{path}"
-        if path != '/':
-            url += '/'
-        if _send_authenticated_request(url, username, password) == 401:
-            break
-        status_code, _realm = _send_raw_request(url)
-        if status_code != 401:
-            break
-        if _realm != realm:
-            break
+    credentials_path = await _find_realm_root(riddle, path, _is_same_realm)
+    if not credentials_path:
+        # Realm root couldn't be told
+        raise _HostUnavailable(url)
 
     # Add username and password to previously recorded empty credentials
     query = '''
@@ -177,6 +200,7 @@ async def _check_and_record_credentials(
         '''
         values |= {'realm': realm}
         await database.execute(query, values)
+    await credential_realms.invalidate(riddle['alias'])
 
     # Log finding and user who did it
     query = '''
@@ -209,38 +233,92 @@ async def _check_and_record_credentials(
     return credentials_path
 
 
-def _send_raw_request(url: str) -> tuple[int, str | None]:
+async def _find_realm_root(
+    riddle: dict,
+    path: str,
+    is_same_realm: Callable[[str], Awaitable[bool | None]],
+) -> str | None:
+    '''
+    Find outermost ancestor directory of (protected) path
+    still guarded by the same realm, bisecting on depth
+    (as protection is inherited by every folder below).
+    Return `None` if any check fails (i.e `is_same_realm` returns `None`).
+    '''
 
-    res = requests.get(url, timeout=10)
-    if res.status_code != 401:
-        # Path isn't protected at all
-        return res.status_code, None
+    # Ancestors from innermost to outermost (i.e up to root or a `..`)
+    ancestors = []
+    ancestor = path
+    while ancestor != '/' and os.path.basename(ancestor) != '..':
+        ancestor = os.path.dirname(ancestor)
+        ancestors.append(ancestor)
+
+    # Count how many of them are inside the realm, in ~log(depth) probes
+    lo, hi = 0, len(ancestors)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        url = f"{riddle['root_path']}{ancestors[mid]}"
+        if ancestors[mid] != '/':
+            url += '/'
+        same_realm = await is_same_realm(url)
+        if same_realm is None:
+            # Unavailable host; can't tell
+            return None
+        if same_realm:
+            lo = mid + 1
+        else:
+            hi = mid
 
-    # Get realm message from unauthenticated (401) response header
-    auth_header = res.headers.get('WWW-Authenticate', '')
-    try:
-        return 401, re.search(r'realm="([^"]*)"', auth_header)[1]
-    except IndexError:
-        return 401, None
+    return ancestors[lo - 1] if lo else path
 
 
-def _send_authenticated_request(url: str, username: str, password: str) -> int:
+async def _send_authenticated_request(
+    alias: str, url: str, username: str, password: str
+) -> int | None:
     parsed_url = urlsplit(url)
-    auth = HTTPBasicAuth(username, password)
+    auth = (username, password)
     # TODO use riddle alias instead of URL, post-refactoring
     if re.fullmatch(r'[www.]?thestringharmony.com', parsed_url.hostname):
         if '?' not in url:
             url += '?_='
         url += f"&username={username}&password={password}"
         auth = None
-    res = requests.get(url, auth=auth, timeout=10)
-    return res.status_code
+    status_code, _ = await _probe_auth(alias, url, auth)
+    return status_code
+
+
+async def _probe_auth(
+    alias: str, url: str, auth: tuple[str, str] | None = None
+) -> tuple[int | None, str | None]:
+    '''
+    Return status code and realm of riddle page (possibly with credentials),
+    reusing recent results (unless riddle's credentials were edited by admin).
+    '''
+
+    probes = await auth_probes.get(alias)
+    credentials_hash = \
+        hashlib.sha256(':'.join(auth).encode()).hexdigest() if auth else ''
+    key = (url, credentials_hash)
+    if entry := probes.get(key):
+        probe_time, result = entry
+        if time.monotonic() - probe_time < AUTH_PROBE_TTL:
+            return result
+        del probes[key]
+
+    result = await get_auth_status(url, auth)
+    status_code, _ = result
+    if status_code is not None:
+        # Only keep actual answers, so unavailable hosts are retried
+        probes[key] = (time.monotonic(), result)
+        while len(probes) > MAX_AUTH_PROBES:
+            probes.popitem(last=False)
+
+    return result
 
 
 async def _record_user_credentials(alias: str, credentials_path: str) -> bool:
     '''Record new user credentials, or otherwise add missing unlock time.'''
 
-    user = await discord.get_user()
+    user = await get_session_context().get_user()
 
     # Create new user record
     query = '''
@@ -253,9 +331,11 @@ async def _record_user_credentials(alias: str, credentials_path: str) -> bool:
         'username': user.name,
         'path': credentials_path,
         'unlock_time': datetime.utcnow(),
-        'incognito': await is_user_incognito(),
+        'incognito': await get_session_context().is_incognito(),
     }
     if await database.execute(query, values):
+        _add_unlocked_credentials(alias, user.name, credentials_path)
+        await bump_progress_version(alias, user.name)
         return True
     
     # Record unlock time if not present yet
@@ -270,72 +350,194 @@ async def _record_user_credentials(alias: str, credentials_path: str) -> bool:
     '''
     del values['incognito']
     if await database.execute(query, values):
+        _add_unlocked_credentials(alias, user.name, credentials_path)
+        await bump_progress_version(alias, user.name)
         return True
 
     return False
 
 
-async def get_path_credentials(alias: str, path: str) -> dict:
-    '''Get required credentials (if any) for the visited path.'''
+def _add_unlocked_credentials(alias: str, username: str, path: str):
+    '''Write newly unlocked credentials through player's cached progress.'''
+    if progress := peek_player_progress(alias, username):
+        progress.credentials.add(path)
+
 
+async def _build_realm_trie(alias: str) -> dict:
+    '''
+    Build prefix trie of riddle's protected paths, segment by segment
+    (each node being a `{'children': {...}, 'credentials': row}` dict).
+    '''
     query = '''
         SELECT * FROM riddle_credentials
         WHERE riddle = :riddle
     '''
-    all_credentials = {
-        credentials['path']: credentials
-        for credentials in await database.fetch_all(query, {'riddle': alias})
-    }
-    if not all_credentials:
-        # Avoid frequent iterations in credentialless riddles
-        return {'path': '/', 'username': '', 'password': ''}
+    root = {'children': {}, 'credentials': None}
+    for row in await database.fetch_all(query, {'riddle': alias}):
+        node = root
+        for segment in _get_path_segments(row['path']):
+            node = node['children'].setdefault(
+                segment, {'children': {}, 'credentials': None}
+            )
+        node['credentials'] = dict(row)
+
+    return root
+
+
+# Credentials may also be (and often are) edited directly through the DB
+credential_realms = RiddleCache('credential_realms', _build_realm_trie, ttl=300)
+'''Per-riddle trie of credential realms (protected paths).'''
+
+
+async def _new_auth_probes(alias: str) -> OrderedDict:
+    '''Start riddle's (empty) record of HTTP auth probe results.'''
+    return OrderedDict()
+
 
-    path = path.partition('?')[0]
-    while True:
-        if credentials := all_credentials.get(path):
+# Invalidated on admin credentials edits only, not on players' discoveries
+auth_probes = RiddleCache('auth_probes', _new_auth_probes)
+'''
+Per-riddle recent `{(url, credentials_hash): (probe_time, result)}` pairs,
+401 results included (but not unavailable ones).
+'''
+
+AUTH_PROBE_TTL = 120
+'''Time (in seconds) for which HTTP auth probe results are reused.'''
+
+MAX_AUTH_PROBES = 4096
+'''Maximum number of HTTP auth probe results kept in memory per riddle.'''
+
+
+def _get_path_segments(path: str) -> list[str]:
+    '''Split path into its segments (none for root).'''
+    return path[1:].split('/') if path != '/' else []
+
+
+async def get_path_credentials(alias: str, path: str) -> dict:
+    '''Get required credentials (if any) for the visited path.'''
+    return (await get_paths_credentials(alias, [path]))[path]
+
+
+async def get_paths_credentials(
+    alias: str, paths: Iterable[str], user: User | None = None
+) -> dict[str, dict]:
+    '''
+    Get required credentials for many paths at once, in a single
+    sorted walk of riddle's realm trie (so paths sharing parent folders
+    share the descent), as a dict of `path -> credentials` pairs.
+        :param user: Player whose unlock status of each path's realm
+            is to be flagged in the credentials' `unlocked` key.
+    '''
+
+    root = await credential_realms.get(alias)
+
+    # Trie nodes along the last walked path, with the innermost
+    # `(depth, credentials)` found from root down to each of them
+    stack = [(root, (0, root['credentials']) if root['credentials'] else None)]
+    last_segments = []
+
+    all_credentials = {}
+    for path, segments in sorted(
+        ((path, _get_path_segments(path.partition('?')[0])) for path in paths),
+        key=lambda item: item[1],
+    ):
+        # Backtrack to the deepest folder shared with the previous path
+        shared = 0
+        for segment, last_segment in zip(segments, last_segments):
+            if segment != last_segment:
+                break
+            shared += 1
+        del stack[shared + 1:]
+
+        # Descend from there, as far as the trie goes
+        for depth, segment in enumerate(segments[shared:], shared + 1):
+            parent, innermost = stack[-1]
+            node = parent and parent['children'].get(segment)
+            if node and node['credentials']:
+                innermost = (depth, node['credentials'])
+            stack.append((node, innermost))
+        last_segments = segments
+
+        # Paths outside root path aren't protected by realms above their `..`s
+        min_depth = max(
+            (depth for depth, segment in enumerate(segments, 1)
+                if segment == '..'),
+            default=0,
+        )
+        innermost = stack[len(segments)][1]
+        if innermost and innermost[0] >= min_depth:
             # Innermost credentials found
-            return dict(credentials)
-        if path == '/' or os.path.basename(path) == '..':
-            break
-        path = os.path.dirname(path)
+            all_credentials[path] = dict(innermost[1])
+        else:
+            # Path isn't protected at all
+            all_credentials[path] = \
+                {'path': '/', 'username': '', 'password': ''}
+
+    if user:
+        unlocked_realms = await get_unlocked_realms(
+            alias, user,
+            {credentials['path'] for credentials in all_credentials.values()},
+        )
+        for credentials in all_credentials.values():
+            credentials['unlocked'] = credentials['path'] in unlocked_realms
+
+    return all_credentials
 
-    # Path isn't protected at all
-    return {'path': '/', 'username': '', 'password': ''}
+
+async def get_unlocked_credentials_paths(
+    alias: str, user: User
+) -> set[str]:
+    '''Return paths of every credentials player has unlocked in riddle.'''
+
+    if progress := await get_player_progress(alias, user.name):
+        return progress.credentials
+
+    # No riddle account (and so no cached progress) yet
+    query = '''
+        SELECT path FROM user_credentials
+        WHERE riddle = :riddle AND username = :username
+    '''
+    values = {'riddle': alias, 'username': user.name}
+    return {row['path'] for row in await database.fetch_all(query, values)}
+
+
+async def get_unlocked_realms(
+    alias: str, user: User, paths: Iterable[str]
+) -> set[str]:
+    '''Return which of the given credentials paths player has unlocked.'''
+    return await get_unlocked_credentials_paths(alias, user) & set(paths)
 
 
 async def has_unlocked_path_credentials(
     alias: str, user: User, path: str
 ) -> bool:
     '''Check if player has unlocked credentials for path.'''
-    query = '''
-        SELECT 1 FROM user_credentials
-        WHERE riddle = :riddle
-            AND username = :username
-            AND path = :path
-    '''
-    values = {
-        'riddle': alias,
-        'username': user.name,
-        'path': path,
-    } 
-    return await database.fetch_val(query, values)
+    return path in await get_unlocked_credentials_paths(alias, user)
 
 
 async def get_all_unlocked_credentials(
     alias: str, user: User
 ) -> dict[str, dict]:
 
+    if user:
+        # Match player's unlocked paths against riddle's realms in memory
+        credentials = {}
+        for path in await get_unlocked_credentials_paths(alias, user):
+            realm = await get_path_credentials(alias, path)
+            if realm['path'] == path:
+                credentials[path] = {
+                    'username': realm['username'],
+                    'password': realm['password'],
+                }
+        return credentials
+
     query = '''
         SELECT rc.path, rc.username, rc.password
         FROM riddle_credentials rc INNER JOIN user_credentials uc
             ON rc.riddle = uc.riddle AND rc.path = uc.path
-        WHERE rc.riddle = :riddle AND uc.username LIKE :username
+        WHERE rc.riddle = :riddle
     '''
-    values = {
-        'riddle': alias,
-        'username': user.name if user else '%',
-    }
-    result = await database.fetch_all(query, values)
+    result = await database.fetch_all(query, {'riddle': alias})
     credentials = {
         row['path']: {
             'username': row['username'],
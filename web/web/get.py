@@ -5,6 +5,7 @@ from quartcord import requires_authorization
 
 from admin.admin_auth import is_admin_of
 from auth import discord
+from context import get_session_context
 from inject import get_riddles
 from levels import get_pages
 from util.db import database
@@ -54,7 +55,7 @@ async def get_user_riddle_data(
         # Raw 401 to avoid redirections to /login
         abort(401)
 
-    user = await discord.get_user()
+    user = await get_session_context().get_user()
     values = {'username': user.name}
     if not alias:
         # Get riddle currently being played (if any)
@@ -176,7 +177,7 @@ async def get_current_riddle_data():
     '''Get currently being played riddle data for authenticated user.'''
 
     # Get player and riddle data from DB
-    user = await discord.get_user()
+    user = await get_session_context().get_user()
     query = '''
         SELECT * FROM accounts acc
         INNER JOIN riddles r ON acc.current_riddle = r.alias
@@ -0,0 +1,191 @@
+import asyncio
+from collections import Counter
+import time
+
+from counters import fold_counter_shards, increment_counters, RIDDLE_HITS
+from util.db import database
+
+
+class HitCounterAggregator:
+    '''
+    Write-behind accumulator of hit counter increments,
+    flushed to DB in batches (at most every `FLUSH_INTERVAL` seconds,
+    or as soon as `MAX_PENDING` hits are waiting).
+    '''
+
+    FLUSH_INTERVAL = 5.0
+    '''Maximum time (in seconds) a hit is kept solely in memory.'''
+
+    MAX_PENDING = 200
+    '''Maximum number of unflushed hits (i.e lost on a worker crash).'''
+
+    FOLD_INTERVAL = 600.0
+    '''Time (in seconds) between folds of sharded counters into base ones.'''
+
+    _SHARDED = {
+        'riddles': RIDDLE_HITS,
+    }
+    '''Sharded counters (contended by every player), by counter table.'''
+
+    _QUERIES = {
+        'accounts': '''
+            UPDATE accounts
+            SET global_hit_counter = global_hit_counter + :delta
+            WHERE username = :username
+        ''',
+        'riddle_accounts': '''
+            UPDATE riddle_accounts SET hit_counter = hit_counter + :delta
+            WHERE riddle = :riddle AND username = :username
+        ''',
+        'user_levels': '''
+            UPDATE user_levels
+            SET completion_hit_counter = completion_hit_counter + :delta
+            WHERE riddle = :riddle
+                AND username = :username
+                AND level_name = :level_name
+                AND completion_time IS NULL
+        ''',
+    }
+    '''Batched update queries, by (unsharded) counter table.'''
+
+    _KEYS = {
+        'riddles': ('riddle',),
+        'accounts': ('username',),
+        'riddle_accounts': ('riddle', 'username'),
+        'user_levels': ('riddle', 'username', 'level_name'),
+    }
+    '''Query parameters identifying a counter, by counter table.'''
+
+    def __init__(self):
+        self._deltas = {table: Counter() for table in self._KEYS}
+        self._pending = 0
+        self._task: asyncio.Task | None = None
+        self._flush_task: asyncio.Task | None = None
+        self._lock = asyncio.Lock()
+
+    def add_hit(self, riddle: str, username: str, level_name: str | None):
+        '''
+        Account player hit on riddle
+        (and on the last level visited, if still unbeaten).
+        '''
+
+        self._deltas['riddles'][(riddle,)] += 1
+        self._deltas['accounts'][(username,)] += 1
+        self._deltas['riddle_accounts'][(riddle, username)] += 1
+        if level_name:
+            self._deltas['user_levels'][(riddle, username, level_name)] += 1
+        self._pending += 1
+
+        if not self._task:
+            # Lazily start periodic flushing on the first hit
+            self._task = asyncio.create_task(self._flush_periodically())
+        if self._pending >= self.MAX_PENDING and not self._flush_task:
+            # Flush early, but in the background (and not on behalf of
+            # whichever request happened to reach the threshold)
+            self._flush_task = asyncio.create_task(self._try_flush())
+            self._flush_task.add_done_callback(self._forget_flush_task)
+
+    def take_level_hits(
+        self, riddle: str, username: str, level_name: str
+    ) -> int:
+        '''
+        Remove and return player's unflushed hits on level
+        (i.e to be written along with its completion).
+        '''
+        hits = self._deltas['user_levels'].pop(
+            (riddle, username, level_name), 0
+        )
+        self._pending = max(self._pending - hits, 0)
+        return hits
+
+    def restore_level_hits(
+        self, riddle: str, username: str, level_name: str, hits: int
+    ):
+        '''Give back level hits taken before (i.e if completion failed).'''
+        if hits:
+            self._deltas['user_levels'][(riddle, username, level_name)] += hits
+            self._pending += hits
+
+    async def flush(self):
+        '''Write accumulated increments to DB.'''
+
+        async with self._lock:
+            deltas = self._deltas
+            self._deltas = {table: Counter() for table in self._KEYS}
+            self._pending = 0
+            error = None
+            for table, counter in deltas.items():
+                if not counter:
+                    continue
+                try:
+                    await self._write(table, counter)
+                except Exception as e:
+                    # Keep increments around for the next flush
+                    self._deltas[table].update(counter)
+                    self._pending += sum(counter.values())
+                    error = e
+            if error:
+                raise error
+
+    async def _write(self, table: str, counter: Counter):
+        '''
+        Write table's accumulated increments to DB, all or nothing
+        (so a failed write can be retried without counting twice).
+        '''
+
+        async with database.transaction():
+            if sharded_counter := self._SHARDED.get(table):
+                for (riddle,), delta in counter.items():
+                    await increment_counters(
+                        sharded_counter, riddle, {'': delta}
+                    )
+                return
+
+            values = [
+                dict(zip(self._KEYS[table], key)) | {'delta': delta}
+                for key, delta in counter.items()
+            ]
+            await database.execute_many(self._QUERIES[table], values)
+
+    async def close(self):
+        '''Stop periodic flushing and write any remaining increments.'''
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+    async def _flush_periodically(self):
+        '''
+        Keep flushing increments every `FLUSH_INTERVAL` seconds
+        (and folding sharded counters every `FOLD_INTERVAL` ones).
+        '''
+        last_fold = time.monotonic()
+        while True:
+            await asyncio.sleep(self.FLUSH_INTERVAL)
+            await self._try_flush()
+            if time.monotonic() - last_fold >= self.FOLD_INTERVAL:
+                last_fold = time.monotonic()
+                await self._try_fold()
+
+    async def _try_fold(self):
+        '''Fold sharded counters, logging any failure.'''
+        for counter in set(self._SHARDED.values()):
+            try:
+                await fold_counter_shards(counter)
+            except Exception as e:
+                print(f"> Failed to fold {counter} shards: {e}", flush=True)
+
+    async def _try_flush(self):
+        '''Flush increments, logging (and keeping them on) any failure.'''
+        try:
+            await self.flush()
+        except Exception as e:
+            print(f"> Failed to flush hit counters: {e}", flush=True)
+
+    def _forget_flush_task(self, _task: asyncio.Task):
+        '''Allow a new early flush once the current one is done.'''
+        self._flush_task = None
+
+
+# Worker-wide hit counter aggregator
+hit_counters = HitCounterAggregator()
@@ -0,0 +1,198 @@
+from collections import OrderedDict
+import json
+from urllib.parse import parse_qsl
+
+from cache import RiddleCache
+from levels import listify
+from util.db import database
+
+
+async def _build_page_index(alias: str) -> dict[str, dict]:
+    '''Build dict of `{path: page_data}` for every recorded riddle page.'''
+    query = '''
+        SELECT path, level_name, hidden, removed, special,
+            alias_for, status_code, EXISTS(
+                SELECT 1 FROM user_pages up
+                WHERE up.riddle = lp.riddle AND up.path = lp.path
+            ) AS visited
+        FROM level_pages lp
+        WHERE riddle = :riddle
+    '''
+    result = await database.fetch_all(query, {'riddle': alias})
+    return {row['path']: dict(row) for row in result}
+
+
+# Pages may also be (and often are) edited directly through the DB
+page_index = RiddleCache('page_index', _build_page_index, ttl=300)
+'''Per-riddle index of recorded pages' metadata.'''
+
+
+async def get_page_data(alias: str, path: str) -> dict | None:
+    '''Return recorded page's metadata, or `None` if page isn't recorded.'''
+    pages = await page_index.get(alias)
+    return pages.get(path)
+
+
+def update_page_data(alias: str, path: str, **data):
+    '''Update (or add) page's metadata in this worker's index, if loaded.'''
+    if (pages := page_index.peek(alias)) is None:
+        return
+    if not (page := pages.get(path)):
+        page = pages[path] = {
+            'path': path, 'level_name': None,
+            'hidden': None, 'removed': None, 'special': None,
+            'alias_for': None, 'status_code': None, 'visited': False,
+        }
+    page |= data
+
+
+_query_page_indexes: dict[str, tuple[dict, int, dict]] = {}
+'''Per-riddle `(pages, page_count, query_pages)` derived from page index.'''
+
+
+async def get_query_pages(
+    alias: str, main_path: str
+) -> list[tuple[dict, list[tuple[str, str]]]]:
+    '''
+    Return recorded query pages for given main path
+    (most specific first), along with their parsed query params.
+    '''
+
+    pages = await page_index.get(alias)
+    cached = _query_page_indexes.get(alias)
+    if not cached or cached[0] is not pages or cached[1] != len(pages):
+        # Page index has been rebuilt or added to since; derive it again
+        query_pages = {}
+        for path in sorted(pages, reverse=True):
+            main, sep, query_string = path.partition('?')
+            if sep:
+                query_pages.setdefault(main, []).append(
+                    (pages[path], parse_qsl(query_string))
+                )
+        cached = _query_page_indexes[alias] = \
+            (pages, len(pages), query_pages)
+
+    return cached[2].get(main_path, [])
+
+
+async def _build_level_index(alias: str) -> dict[str, dict]:
+    '''
+    Build dict containing riddle levels (in order),
+    a `{answer_path: [level_names]}` reverse index of their answers
+    and the `{level_name: [requirements]}` level requirement DAG.
+    '''
+    query = '''
+        SELECT * FROM levels
+        WHERE riddle = :riddle
+        ORDER BY set_index, `index`
+    '''
+    result = await database.fetch_all(query, {'riddle': alias})
+    levels = {row['name']: dict(row) for row in result}
+    levels_by_answer = {}
+    for level in levels.values():
+        for path in listify(level['answer']):
+            levels_by_answer.setdefault(path, []).append(level['name'])
+
+    query = '''
+        SELECT level_name, requires, finding_is_enough
+        FROM level_requirements
+        WHERE riddle = :riddle
+    '''
+    result = await database.fetch_all(query, {'riddle': alias})
+    requirements = {}
+    for row in result:
+        requirements.setdefault(row['level_name'], []).append(dict(row))
+
+    return {
+        'levels': levels,
+        'levels_by_answer': levels_by_answer,
+        'requirements': requirements,
+    }
+
+
+level_index = RiddleCache('level_index', _build_level_index, ttl=300)
+'''Per-riddle index of levels, their answers and requirements.'''
+
+
+async def get_level_data(alias: str, level_name: str | None) -> dict | None:
+    '''Return level's DB data, or `None` if there's no such level.'''
+    index = await level_index.get(alias)
+    return index['levels'].get(level_name)
+
+
+async def get_answered_levels(alias: str, path: str) -> list[dict]:
+    '''Return (ordered) levels which have the given path as an answer.'''
+    index = await level_index.get(alias)
+    return [
+        index['levels'][level_name]
+        for level_name in index['levels_by_answer'].get(path, [])
+    ]
+
+
+async def get_level_requirements(alias: str, level_name: str) -> list[dict]:
+    '''Return level's requirements (i.e levels to be found/beaten first).'''
+    index = await level_index.get(alias)
+    return index['requirements'].get(level_name, [])
+
+
+async def _build_cheevo_index(alias: str) -> dict[str, list[dict]]:
+    '''Build dict of `{path: [achievements]}` for the riddle's cheevo pages.'''
+    query = 'SELECT * FROM achievements WHERE riddle = :riddle'
+    result = await database.fetch_all(query, {'riddle': alias})
+    cheevos_by_path = {}
+    for cheevo in map(dict, result):
+        try:
+            paths_json = json.loads(cheevo['paths_json'])
+        except json.decoder.JSONDecodeError:
+            continue
+        for path in paths_json.get('paths', []):
+            cheevos_by_path.setdefault(path, []).append(cheevo)
+
+    return cheevos_by_path
+
+
+cheevo_index = RiddleCache('cheevo_index', _build_cheevo_index, ttl=300)
+'''Per-riddle index of achievements by (trigger) path.'''
+
+
+async def get_path_cheevos(alias: str, path: str) -> list[dict]:
+    '''Return achievements which have the given path as a trigger.'''
+    cheevos_by_path = await cheevo_index.get(alias)
+    return cheevos_by_path.get(path, [])
+
+
+MAX_CANONICAL_PATHS = 4096
+'''Maximum number of canonical paths kept in memory per riddle.'''
+
+
+async def _build_canonical_paths(_alias: str) -> OrderedDict:
+    '''Start riddle's (initially empty) canonical path LRU cache.'''
+    return OrderedDict()
+
+
+# Canonical forms may rely on live page contents, so keep them short-lived
+canonical_paths = RiddleCache('canonical_paths', _build_canonical_paths, ttl=300)
+'''Per-riddle cache of `{(raw_path, status_code): canonical_path}` pairs.'''
+
+
+async def get_canonical_path(
+    alias: str, raw_path: str, status_code: int
+) -> str | None:
+    '''Return raw path's previously found canonical form, if any.'''
+    paths = await canonical_paths.get(alias)
+    key = (raw_path, status_code, page_index.version(alias))
+    if (path := paths.get(key)) is not None:
+        paths.move_to_end(key)
+    return path
+
+
+def set_canonical_path(
+    alias: str, raw_path: str, status_code: int, path: str
+):
+    '''Record raw path's canonical form (for current riddle pages).'''
+    if (paths := canonical_paths.peek(alias)) is None:
+        return
+    # Key by page index version, so any page change makes entries unreachable
+    paths[(raw_path, status_code, page_index.version(alias))] = path
+    if len(paths) > MAX_CANONICAL_PATHS:
+        paths.popitem(last=False)
@@ -11,6 +11,7 @@ from pycountry import pycountry
 from admin.admin_auth import is_admin_of
 from auth import discord, User
 from countries import country_names
+from counters import get_counter_sums, LEVEL_COMPLETIONS, RIDDLE_HITS
 from levels import get_root_path
 from players.account import is_user_incognito
 from riddles import level_ranks, cheevo_ranks, player_ranks
@@ -51,6 +52,9 @@ async def get_riddles(
         {'WHERE unlisted IS NOT TRUE' if not unlisted else ''}
     """
     riddles = [dict(row) for row in await database.fetch_all(query)]
+    hit_sums = await get_counter_sums(RIDDLE_HITS)
+    for riddle in riddles:
+        riddle['hit_counter'] += hit_sums.get((riddle['alias'], ''), 0)
     if not include_counters:
         return riddles
 
@@ -91,7 +95,14 @@ async def get_levels(alias: str) -> dict[str, dict]:
         ORDER BY set_index, `index`
     '''
     ordered_levels = await database.fetch_all(query, {'riddle': alias})
-    return {level['name']: dict(level) for level in ordered_levels}
+    completion_sums = await get_counter_sums(LEVEL_COMPLETIONS, alias)
+    return {
+        level['name']: dict(level) | {
+            'completion_count': level['completion_count']
+                + completion_sums.get((alias, level['name']), 0)
+        }
+        for level in ordered_levels
+    }
 
 
 async def get_achievements(
@@ -1,4 +1,4 @@
-from collections.abc import Iterator
+from collections.abc import Iterable, Iterator
 from copy import deepcopy
 from datetime import datetime
 from itertools import islice
@@ -9,7 +9,8 @@ from quart import Blueprint, jsonify, render_template, request
 from quartcord import requires_authorization
 
 from admin.admin_auth import is_admin_of
-from auth import discord
+from context import get_session_context
+from counters import get_counter_sums, LEVEL_COMPLETIONS
 from credentials import get_all_unlocked_credentials
 from util.db import database
 from util.levels import get_ordered_levels
@@ -157,8 +158,14 @@ async def level_list(alias: str):
         ORDER BY `index`
     '''
     values = {'riddle': alias}
+    completion_sums = await get_counter_sums(LEVEL_COMPLETIONS, alias)
     levels_list = [
-        {**row, 'image': os.path.basename(row['image'] or '')}
+        {
+            **row,
+            'image': os.path.basename(row['image'] or ''),
+            'completion_count': row['completion_count']
+                + completion_sums.get((alias, row['name']), 0),
+        }
         for row in await database.fetch_all(query, values)
     ]
 
@@ -170,7 +177,7 @@ async def level_list(alias: str):
     level_sets = await database.fetch_all(query, values)
 
     # Retrieve user-specific level data
-    user = await discord.get_user()
+    user = await get_session_context().get_user()
     query = '''
         SELECT * FROM user_levels
         WHERE riddle = :riddle AND username = :username
@@ -204,9 +211,13 @@ async def get_pages(
     index_by_levels: bool = True,
     as_json: bool = True,
     admin: bool = False,
+    only_levels: Iterable[str] | None = None,
 ) -> dict | str:
     '''Return a recursive JSON of all user level folders and pages.
-    If a level is specified, return only pages from that level instead.'''
+    If a level is specified, return only pages from that level instead.
+    If `only_levels` are given, build page trees of just those ones
+    (as opposed to `requested_level`, still taking all pages into
+    account for their front pages and answers).'''
 
     def _stringify_datetime(time: datetime) -> str:
         return time.strftime('%Y/%b/%d at %H:%M (UTC)')
@@ -238,7 +249,7 @@ async def get_pages(
                 {'AND removed IS NOT TRUE' if not include_removed else ''}
         """
     else:
-        user = await discord.get_user()
+        user = await get_session_context().get_user()
         # TODO
         query = f"""
             SELECT up.level_name, up.path, up.access_time, lp.*
@@ -353,6 +364,8 @@ async def get_pages(
     for level_name, level_paths in paths.items():
         if not admin and not unlocked_levels.get(level_name):
             continue
+        if only_levels is not None and level_name not in only_levels:
+            continue
         if index_by_levels:
             level_pages = pages[level_name] = {'/': deepcopy(base)}
         else:
@@ -489,7 +502,7 @@ async def rate(alias: str, level_name: str, rating: int):
         return f"[{alias}] Level {level_name} not found.", 404
 
     # Get user's previous rating
-    user = await discord.get_user()
+    user = await get_session_context().get_user()
     query = '''
         SELECT * FROM user_levels
         WHERE riddle = :riddle
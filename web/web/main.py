@@ -31,16 +31,20 @@ from admin.cheevos import admin_cheevos
 from admin.health import admin_health
 from admin.levels.levels import admin_levels
 from admin.levels.upload_pages import admin_upload_pages
+from admin.metrics import admin_metrics
 from admin.page_changes import admin_page_changes
 from admin.recent import admin_recent
 from admin.update import admin_update
 from auth import auth, session_cookie
 from countries import countries
 from get import get
+from hit_counters import hit_counters
 from home import home
 from info import info
 from inject import context_processor
 from levels import levels
+from metrics import stage_timings
+from outbox import bot_outbox
 from players.account import account
 from players.export import export
 from players.page_catalog import page_catalog
@@ -48,10 +52,12 @@ from players.players import players
 from players.profile import profile
 from process import process
 from util.db import database
+from util.riddle import recount_mastery_counts
+from webclient import close_session
 
 for blueprint in (
     admin_cheevos, admin_health, admin_levels, admin_upload_pages,
-    admin_page_changes, admin_recent, admin_update,
+    admin_metrics, admin_page_changes, admin_recent, admin_update,
     account, auth, countries, export, get, home, info,
     levels, page_catalog, players, process, profile,
 ):
@@ -85,6 +91,9 @@ async def before():
         
         # Connect to MySQL database
         await database.connect()
+
+        # Backfill levels/cheevos left for mastery not yet computed
+        await recount_mastery_counts(missing_only=True)
     
     if not hasattr(before, 'first_request_done'):
         # First request for app process
@@ -97,6 +106,23 @@ async def before():
         return redirect(rp[:-1])
 
 
+@app.after_serving
+async def shutdown():
+    '''Procedures to be done on app shutdown.'''
+
+    # Write hit counter increments still held in memory
+    await hit_counters.close()
+
+    # Stop delivering bot events (the remaining ones are kept in DB)
+    await bot_outbox.close()
+
+    # Write stage timings still held in memory
+    await stage_timings.close()
+
+    # Close pooled connections to riddle hosts
+    await close_session()
+
+
 @app.after_request
 async def cookies(response):
     '''Set session cookie to be valid accross sites (SameSite=None)
@@ -0,0 +1,127 @@
+import asyncio
+from bisect import bisect_left
+from collections import Counter
+from contextlib import contextmanager
+import time
+
+from util.db import database
+
+
+class StageTimings:
+    '''
+    Latency histograms of `/process` stages, per riddle.
+
+    Each worker accumulates its own observations in memory and adds them
+    (every `FLUSH_INTERVAL` seconds) to the shared `_stage_timings` table,
+    from which the histograms of all workers are exposed together.
+    '''
+
+    BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+    '''Histogram bucket upper bounds (in seconds).'''
+
+    FLUSH_INTERVAL = 10.0
+    '''Maximum time (in seconds) observations are kept solely in memory.'''
+
+    def __init__(self):
+        self._deltas = Counter()
+        self._task: asyncio.Task | None = None
+        self._lock = asyncio.Lock()
+
+    def record(self, stage: str, riddle: str, seconds: float):
+        '''Account a stage run taking given time.'''
+        idx = bisect_left(self.BUCKETS, seconds)
+        bucket = str(self.BUCKETS[idx]) if idx < len(self.BUCKETS) else '+Inf'
+        self._deltas[(stage, riddle, bucket)] += 1
+        self._deltas[(stage, riddle, 'count')] += 1
+        self._deltas[(stage, riddle, 'sum')] += seconds
+
+        if not self._task:
+            # Lazily start periodic flushing on the first observation
+            self._task = asyncio.create_task(self._flush_periodically())
+
+    @contextmanager
+    def measure(self, stage: str, riddle: str):
+        '''Time the enclosed block as a run of stage.'''
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, riddle, time.perf_counter() - start)
+
+    async def flush(self):
+        '''Add accumulated observations to the shared histograms.'''
+
+        async with self._lock:
+            deltas, self._deltas = self._deltas, Counter()
+            if not deltas:
+                return
+            query = '''
+                INSERT INTO _stage_timings (stage, riddle, bucket, value)
+                VALUES (:stage, :riddle, :bucket, :value)
+                ON DUPLICATE KEY UPDATE value = value + VALUES(value)
+            '''
+            values = [
+                {
+                    'stage': stage, 'riddle': riddle,
+                    'bucket': bucket, 'value': value,
+                }
+                for (stage, riddle, bucket), value in deltas.items()
+            ]
+            try:
+                await database.execute_many(query, values)
+            except Exception:
+                # Keep observations around for the next flush
+                self._deltas.update(deltas)
+                raise
+
+    async def render(self) -> str:
+        '''Return all workers' histograms in Prometheus text format.'''
+
+        await self.flush()
+        histograms = {}
+        query = 'SELECT * FROM _stage_timings'
+        for row in await database.fetch_all(query):
+            key = (row['stage'], row['riddle'])
+            histograms.setdefault(key, {})[row['bucket']] = row['value']
+
+        name = 'riddler_process_stage_seconds'
+        lines = [
+            f"# HELP {name} Time spent on each /process stage.",
+            f"# TYPE {name} histogram",
+        ]
+        for (stage, riddle), histogram in sorted(histograms.items()):
+            labels = f'stage="{stage}",riddle="{riddle}"'
+            cumulative = 0
+            for bound in [str(bound) for bound in self.BUCKETS] + ['+Inf']:
+                cumulative += int(histogram.get(bound, 0))
+                lines.append(
+                    f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+                )
+            lines.append(
+                f"{name}_count{{{labels}}} {int(histogram.get('count', 0))}"
+            )
+            lines.append(
+                f"{name}_sum{{{labels}}} {histogram.get('sum', 0):.6f}"
+            )
+
+        return '\n'.join(lines) + '\n'
+
+    async def close(self):
+        '''Stop periodic flushing and write any remaining observations.'''
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+    async def _flush_periodically(self):
+        '''Keep flushing observations every `FLUSH_INTERVAL` seconds.'''
+        while True:
+            await asyncio.sleep(self.FLUSH_INTERVAL)
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"> Failed to flush stage timings: {e}", flush=True)
+
+
+# Worker-wide stage timings
+stage_timings = StageTimings()
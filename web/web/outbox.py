@@ -0,0 +1,179 @@
+import asyncio
+from datetime import datetime, timedelta
+import json
+
+from metrics import stage_timings
+from util.db import database
+from webclient import send_bot_request
+
+
+class BotOutbox:
+    '''
+    Durable queue of bot requests (stored in `_bot_outbox`),
+    delivered in the background, in order for each player.
+
+    Players are claimed by a worker through a DB named lock,
+    so each one's events are never sent concurrently.
+    '''
+
+    POLL_INTERVAL = 5.0
+    '''Maximum time (in seconds) between checks for pending events.'''
+
+    MAX_RETRY_DELAY = 300
+    '''Maximum time (in seconds) between retries of an undelivered event.'''
+
+    def __init__(self):
+        self._task: asyncio.Task | None = None
+        self._wakeup = asyncio.Event()
+
+    async def append(self, username: str, path: str, **kwargs):
+        '''
+        Enqueue bot request on behalf of player
+        (as part of the ongoing transaction, if any).
+        '''
+        query = '''
+            INSERT INTO _bot_outbox
+                (username, path, params, creation_time, next_attempt_time)
+            VALUES (:username, :path, :params, :time, :time)
+        '''
+        values = {
+            'username': username,
+            'path': path,
+            'params': json.dumps(kwargs, default=str),
+            'time': datetime.utcnow(),
+        }
+        await database.execute(query, values)
+
+    def wake(self):
+        '''Have pending events delivered right away.'''
+        if not self._task:
+            # Lazily start consumer on first use
+            self._task = asyncio.create_task(self._consume())
+        self._wakeup.set()
+
+    async def close(self):
+        '''Stop consumer (undelivered events stay in DB).'''
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _consume(self):
+        '''Keep delivering events whenever woken up or polling time comes.'''
+        while True:
+            try:
+                await asyncio.wait_for(
+                    self._wakeup.wait(), timeout=self.POLL_INTERVAL
+                )
+            except TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                query = '''
+                    SELECT DISTINCT username FROM _bot_outbox
+                    WHERE next_attempt_time <= :time
+                '''
+                values = {'time': datetime.utcnow()}
+                for row in await database.fetch_all(query, values):
+                    await self._deliver(row['username'])
+            except Exception as e:
+                print(f"> Failed to deliver bot events: {e}", flush=True)
+
+    async def _deliver(self, username: str):
+        '''Deliver player's due events, oldest first.'''
+
+        async with database.connection() as connection:
+            # Skip player if another worker is already on it
+            query = 'SELECT GET_LOCK(:name, 0)'
+            values = {'name': f"bot_outbox:{username}"}
+            if not await connection.fetch_val(query, values):
+                return
+            try:
+                while event := await self._next_event(connection, username):
+                    if event['next_attempt_time'] > datetime.utcnow():
+                        # Keep order by waiting for head event's retry time
+                        break
+                    if not await self._send(connection, event):
+                        break
+            finally:
+                query = 'SELECT RELEASE_LOCK(:name)'
+                await connection.fetch_val(query, values)
+
+    @staticmethod
+    async def _next_event(connection, username: str) -> dict | None:
+        '''Return player's oldest undelivered event, if any.'''
+        query = '''
+            SELECT * FROM _bot_outbox
+            WHERE username = :username
+            ORDER BY id
+            LIMIT 1
+        '''
+        row = await connection.fetch_one(query, {'username': username})
+        return dict(row) if row else None
+
+    async def _send(self, connection, event: dict) -> bool:
+        '''
+        Send event to bot, dropping it from the outbox on success
+        (or setting it aside in `_bot_outbox_failed` if rejected by bot);
+        otherwise, reschedule it with (capped) exponential backoff.
+        Return whether next events can be sent.
+        '''
+
+        try:
+            params = json.loads(event['params'])
+            alias = params.get('alias', '')
+            with stage_timings.measure('bot_request', alias):
+                status, text = await send_bot_request(event['path'], **params)
+        except Exception as e:
+            status, text = None, str(e)
+
+        if status is None or status >= 500:
+            # Bot down or failing; keep retrying for as long as needed
+            attempts = event['attempts'] + 1
+            delay = min(2 ** min(attempts, 16), self.MAX_RETRY_DELAY)
+            query = '''
+                UPDATE _bot_outbox
+                SET attempts = :attempts, next_attempt_time = :time
+                WHERE id = :id
+            '''
+            values = {
+                'id': event['id'],
+                'attempts': attempts,
+                'time': datetime.utcnow() + timedelta(seconds=delay),
+            }
+            await connection.execute(query, values)
+            return False
+
+        async with connection.transaction():
+            if not 200 <= status < 300:
+                # Rejected by bot, so retrying is pointless;
+                # keep it aside (for inspection) instead of blocking queue
+                print(
+                    f"> Bot rejected event #{event['id']} "
+                    f"for \033[1m{event['username']}\033[0m: "
+                    f"{status} {text[:200]}",
+                    flush=True,
+                )
+                query = '''
+                    INSERT INTO _bot_outbox_failed
+                        (id, username, path, params, creation_time,
+                            attempts, status, response, failure_time)
+                    SELECT id, username, path, params, creation_time,
+                        attempts, :status, :response, :time
+                    FROM _bot_outbox
+                    WHERE id = :id
+                '''
+                values = {
+                    'id': event['id'],
+                    'status': status,
+                    'response': text[:1000],
+                    'time': datetime.utcnow(),
+                }
+                await connection.execute(query, values)
+
+            query = 'DELETE FROM _bot_outbox WHERE id = :id'
+            await connection.execute(query, {'id': event['id']})
+        return True
+
+
+# Worker-wide bot outbox
+bot_outbox = BotOutbox()
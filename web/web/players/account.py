@@ -2,6 +2,7 @@ from quart import Blueprint, request, render_template
 from quartcord import requires_authorization
 
 from auth import discord
+from context import get_session_context
 from inject import country_names
 from util.db import database
 
@@ -45,15 +46,11 @@ async def settings():
         'incognito': 'incognito' in form,
     }
     await database.execute(query, values)
+    get_session_context().forget_account()
 
     return await r('Account details successfully updated!')
 
 
 async def is_user_incognito() -> bool:
     '''Return whether user has incognito mode activated.'''
-    user = await discord.get_user()
-    query = '''
-        SELECT incognito FROM accounts
-        WHERE username = :username
-    '''
-    return await database.fetch_val(query, {'username': user.name})
+    return await get_session_context().is_incognito()
@@ -5,7 +5,7 @@ from quart import Blueprint, render_template
 from quartcord import requires_authorization
 
 from auth import discord
-from credentials import get_path_credentials, has_unlocked_path_credentials
+from credentials import get_paths_credentials
 from inject import get_riddle
 from levels import absolute_paths, get_pages, listify
 
@@ -27,12 +27,23 @@ async def catalog(alias: str):
         as_json=False,
     )
 
+    # Resolve every page's credentials (and their unlock status) at once
+    page_credentials = await get_paths_credentials(
+        alias,
+        [
+            path
+            for level in all_pages_by_level.values()
+            for path, _ in absolute_paths(level['/'])
+        ],
+        user,
+    )
+
     async def _retrieve_page(path: str, page_data: dict) -> dict:
         '''Build URL (possibly w/ credentials) and return page data with it.'''
 
         url = f"{riddle['root_path']}{path}"
-        credentials = await get_path_credentials(alias, path)
-        if await has_unlocked_path_credentials(alias, user, credentials['path']):
+        credentials = page_credentials[path]
+        if credentials['unlocked']:
             username = credentials['username']
             password = credentials['password']
             if username or password:
@@ -1,8 +1,11 @@
+import asyncio
+from contextlib import asynccontextmanager
 from datetime import datetime
-import hashlib
 import json
+import os
 from pathlib import Path
 import re
+import time
 from typing import Callable, Self
 from urllib.parse import (
     SplitResult, parse_qsl,
@@ -11,22 +14,46 @@ from urllib.parse import (
 
 from quart import Blueprint, request, jsonify
 from quartcord.models import User
-import requests
 
 from auth import discord
+from cache import RiddleCache
+from context import get_session_context
+from counters import increment_counter, LEVEL_COMPLETIONS
 from credentials import (
     get_path_credentials,
     has_unlocked_path_credentials,
     process_credentials,
 )
 from get import get_user_riddle_data
+from hit_counters import hit_counters
+from indexes import (
+    get_answered_levels, get_canonical_path, get_level_data,
+    get_level_requirements, get_path_cheevos, get_page_data,
+    get_query_pages, level_index, page_index, set_canonical_path,
+    update_page_data,
+)
 from inject import get_riddle, get_riddles
 from levels import get_pages
+from metrics import stage_timings
+from outbox import bot_outbox
 from players.account import is_user_incognito
+from progress import (
+    bump_progress_version,
+    forget_player_progress,
+    get_changed_levels,
+    get_player_progress,
+    get_progress_version,
+    peek_player_progress,
+    PlayerProgress,
+)
 from riddles import level_ranks, cheevo_ranks
 from util.db import database
-from util.riddle import has_player_mastered_riddle
-from webclient import bot_request
+from util.riddle import (
+    decrement_mastery_count,
+    has_player_mastered_riddle,
+    recount_mastery_counts,
+)
+from webclient import get_content_hash
 
 # Create app blueprint
 process = Blueprint('process', __name__)
@@ -41,9 +68,6 @@ async def process_url(
 ):
     '''Process URL (usually) sent by the browser extension.'''
 
-    # Time 
-    tnow = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
-
     # Flag function call as automated or not
     auto = url is not None
 
@@ -54,7 +78,7 @@ async def process_url(
 
     # Retrieve url, headers and status code from request
     if not auto:
-        user = await discord.get_user()
+        user = await get_session_context().get_user()
         url = (await request.data).decode('utf-8')
         if content_location := request.headers.get('Content-Location'):
             url = urljoin(url, content_location)
@@ -66,56 +90,329 @@ async def process_url(
     if 'Statuscode' in request.headers:
         status_code = int(request.headers.get('Statuscode'))
 
-    # Create path handler object and build player data
+    if admin:
+        # Just parse riddle and path from URL
+        ph = await _PathHandler.build(
+            user, url, status_code, request_type, location
+        )
+        return (ph.riddle_alias, ph.path) if ph else (None, None)
+
+    data, response_code, ph = await _process_hit(
+        user, url, status_code, request_type, location
+    )
+    if data is None:
+        return 'Not part of root path', response_code
+    if ph:
+        known_version = request.headers.get('Progress-Version')
+        data |= await _get_progress_data(ph, known_version)
+
+    return jsonify(data), response_code
+
+
+@process.post('/process-batch')
+async def process_urls():
+    '''
+    Process ordered batch of URLs sent by the browser extension,
+    each entry containing `url`, `statusCode`, `type`, `location`
+    and `contentLocation` (the latter 3 being optional).
+    '''
+
+    if not await discord.authorized:
+        # Not logged in
+        return 'Not logged in', 401
+
+    # Validate whole batch before processing anything
+    batch = await request.get_json(silent=True)
+    if not isinstance(batch, dict):
+        return 'Malformed batch', 400
+    if not isinstance(batch.get('entries'), list):
+        return 'Malformed batch', 400
+    known_versions = batch.get('progressVersions') or {}
+    if not isinstance(known_versions, dict):
+        return 'Malformed batch', 400
+    hits = []
+    for entry in batch['entries']:
+        if not (hit := _parse_batch_entry(entry)):
+            return 'Malformed batch entry', 400
+        hits.append(hit)
+
+    user = await get_session_context().get_user()
+    results = []
+    progress_handlers = {}
+    player_progress = {}
+    for url, status_code, request_type, location in hits:
+        data, response_code, ph = await _process_hit(
+            user, url, status_code, request_type, location, player_progress
+        )
+        if data is None:
+            data = {'message': 'Not part of root path'}
+        results.append({'statusCode': response_code} | data)
+        if ph:
+            progress_handlers[ph.riddle_alias] = ph
+
+    # Send (possibly unchanged) progress data just once per riddle
+    progress = {
+        alias: await _get_progress_data(ph, known_versions.get(alias))
+        for alias, ph in progress_handlers.items()
+    }
+
+    return jsonify({'results': results, 'progress': progress}), 200
+
+
+def _parse_batch_entry(entry) -> tuple | None:
+    '''
+    Return batch entry's `(url, status_code, type, location)`,
+    or `None` if malformed.
+    '''
+
+    if not isinstance(entry, dict) or not isinstance(entry.get('url'), str):
+        return None
+    for key in ('type', 'location', 'contentLocation'):
+        if not isinstance(entry.get(key), str | None):
+            return None
+    status_code = entry.get('statusCode')
+    if status_code is not None:
+        try:
+            # Same as the `Statuscode` header on single hits
+            status_code = int(status_code)
+        except (TypeError, ValueError):
+            return None
+
+    url = entry['url']
+    if content_location := entry.get('contentLocation'):
+        url = urljoin(url, content_location)
+
+    return url, status_code, entry.get('type'), entry.get('location')
+
+
+_player_locks: dict[tuple[str, str], asyncio.Lock] = {}
+'''Locks serializing each `(riddle, username)` player's hits.'''
+
+_player_lock_users: dict[tuple[str, str], int] = {}
+'''Number of hits holding or waiting for each player lock.'''
+
+_pending_hits: dict[tuple, asyncio.Task] = {}
+'''Hits being processed, by user and request info.'''
+
+
+@asynccontextmanager
+async def _player_lock(alias: str, username: str):
+    '''Process player's hits on a riddle one at a time (in this worker).'''
+    key = (alias, username)
+    lock = _player_locks.setdefault(key, asyncio.Lock())
+    _player_lock_users[key] = _player_lock_users.get(key, 0) + 1
+    try:
+        async with lock:
+            yield
+    finally:
+        _player_lock_users[key] -= 1
+        if not _player_lock_users[key]:
+            del _player_lock_users[key]
+            del _player_locks[key]
+
+
+async def _process_hit(
+    user: User,
+    url: str,
+    status_code: int | None,
+    request_type: str | None,
+    location: str | None,
+    player_progress: dict[str, PlayerProgress] | None = None,
+) -> tuple[dict | None, int, '_PathHandler | None']:
+    '''
+    Process a single URL visited by player,
+    sharing the outcome with identical hits already being processed.
+        :param player_progress: Progress already built for player
+            (e.g earlier in the same batch), by riddle alias.
+        :return: Response data (or `None` if outside any root path),
+            response status code, and handler whose player progress
+            data should be sent back (if any).
+    '''
+
+    key = (user.name, url, status_code, request_type, location)
+    if not (task := _pending_hits.get(key)):
+        # First one to arrive; process hit ourselves
+        task = asyncio.create_task(_process_new_hit(
+            user, url, status_code, request_type, location,
+            player_progress if player_progress is not None else {},
+        ))
+        _pending_hits[key] = task
+        task.add_done_callback(lambda _: _pending_hits.pop(key, None))
+
+    # Hand each waiter its own copy of the (later added to) response data
+    data, response_code, ph = await asyncio.shield(task)
+    return (dict(data) if data is not None else None), response_code, ph
+
+
+async def _process_new_hit(
+    user: User,
+    url: str,
+    status_code: int | None,
+    request_type: str | None,
+    location: str | None,
+    player_progress: dict[str, PlayerProgress],
+) -> tuple[dict | None, int, '_PathHandler | None']:
+    '''Process URL, serialized with player's other hits on the riddle.'''
+
+    # Create path handler object
     ph = await _PathHandler.build(
         user, url, status_code, request_type, location
     )
-    if admin:
-        return (ph.riddle_alias, ph.path) if ph else (None, None)
     if not ph:
         # TODO
         # Not inside root path (e.g forum or admin pages)
         print(f"??? {url} ???")
-        if admin:
-            return url
-        return 'Not part of root path', 412
+        return None, 412, None
+
+    # Identify repeated hits, keeping navigations apart from the rest
+    # (e.g prefetches and sub-resource loads of the same page)
+    key = (user.name, ph.riddle_alias, ph.path, status_code, ph.navigated)
+    async with _player_lock(ph.riddle_alias, user.name):
+        if recent_hit := _get_recent_hit(key):
+            # Repeated hit (e.g page reload); count it again if both it
+            # and the original are actual navigations, and reuse response
+            data, response_code, counted, hit_level, with_progress = \
+                recent_hit
+            if counted and ph.navigated:
+                hit_counters.add_hit(ph.riddle_alias, user.name, hit_level)
+                if progress := peek_player_progress(
+                    ph.riddle_alias, user.name
+                ):
+                    progress.riddle_account['hit_counter'] += 1
+            return dict(data), response_code, ph if with_progress else None
+
+        data, response_code, ph_out = \
+            await _process_path(ph, status_code, player_progress)
+        if response_code in [200, 201, 404]:
+            # Valid (or 404) page; serve repeats from memory for a while
+            # (as already seen, in case it was new for player)
+            _add_recent_hit(key, (
+                dict(data), 200 if response_code == 201 else response_code,
+                ph.hit_counted, ph.hit_level, bool(ph_out),
+            ))
+
+        return data, response_code, ph_out
+
+
+DUPLICATE_HIT_WINDOW = float(os.getenv('DUPLICATE_HIT_WINDOW', 5))
+'''Time (in seconds) during which a repeated hit reuses the last response.'''
+
+MAX_RECENT_HITS = 4096
+'''Number of recent hits past which expired ones are purged.'''
+
+_recent_hits: dict[tuple, tuple[float, tuple]] = {}
+'''
+Recent `(username, riddle, path, status, navigated) -> (time, hit)` pairs,
+in order of arrival (and so of expiration).
+'''
+
+
+def _get_recent_hit(key: tuple) -> tuple | None:
+    '''
+    Return response data, code, whether hit was counted (and for which
+    level) and whether progress data was sent back,
+    for a recent identical hit (if any).
+    '''
+    if recent_hit := _recent_hits.get(key):
+        hit_time, hit = recent_hit
+        if time.monotonic() - hit_time < DUPLICATE_HIT_WINDOW:
+            return hit
+    return None
+
+
+def _add_recent_hit(key: tuple, hit: tuple):
+    '''Record processed hit, purging expired ones if there are too many.'''
+    tnow = time.monotonic()
+    _recent_hits.pop(key, None)
+    _recent_hits[key] = (tnow, hit)
+    if len(_recent_hits) > MAX_RECENT_HITS:
+        for key, (hit_time, _) in list(_recent_hits.items()):
+            if tnow - hit_time < DUPLICATE_HIT_WINDOW:
+                break
+            del _recent_hits[key]
 
-    # Create/fetch riddle account data
-    await ph.build_player_riddle_data()
+
+async def _process_path(
+    ph: '_PathHandler',
+    status_code: int | None,
+    player_progress: dict[str, PlayerProgress],
+) -> tuple[dict | None, int, '_PathHandler | None']:
+    '''Process handler's path and build response data.'''
+
+    # Create/fetch riddle account data (if not done already)
+    if progress := player_progress.get(ph.riddle_alias):
+        ph.progress = progress
+        ph.riddle_account = progress.riddle_account
+        ph.user_levels = progress.levels
+    else:
+        await ph.build_player_riddle_data()
+        player_progress[ph.riddle_alias] = ph.progress
 
     # Process received credentials (possibly none)
-    riddle = await get_riddle(ph.riddle_alias)
-    ok = await process_credentials(riddle, ph.path, ph.credentials, status_code)
-    path_credentials = await get_path_credentials(ph.riddle_alias, ph.path)
+    with stage_timings.measure('credentials', ph.riddle_alias):
+        riddle = await get_riddle(ph.riddle_alias)
+        ok = await process_credentials(
+            riddle, ph.path, ph.credentials, status_code
+        )
+        path_credentials = await get_path_credentials(ph.riddle_alias, ph.path)
     if not ok:
-        return jsonify({
+        return {
             'message': 'Wrong or missing user credentials',
             'riddle': ph.riddle_alias,
             'credentialsPath': path_credentials['path'],
             'realm': path_credentials['realm'],
-        }), 403
+        }, 403, None
     if ph.short_run:
-        return jsonify({
+        return {
             'message':
                 f"Trivial auto-redirect ({status_code}); "
                 'skipping path processing',
             'riddle': ph.riddle_alias
-        }), 202
-
-    # Process received path
-    response_code = await ph.process()
-    formatted_path = ph.path
-    if ph.removed:
-        formatted_path = f"\033[9m{formatted_path}\033[0m"
-    if ph.path_alias_for:
-        # Just an alias; if valid/accessible, process canonical path up next
-        formatted_path += f"\033[0m (alias for \033[3m{ph.path_alias_for})"
-        if response_code not in [403, 410]:
-            ph.path = ph.path_alias_for
-            ph.path_alias_for = None
-            if await ph.process() == 201:
-                # Signal 201 if either of the paths is new for the user
-                response_code = 201
+        }, 202, None
+
+    # Process received path, applying all progress
+    # (and enqueuing bot unlock events) at once
+    try:
+        with stage_timings.measure('process', ph.riddle_alias):
+            async with database.transaction():
+                response_code = await ph.process()
+                formatted_path = ph.path
+                if ph.removed:
+                    formatted_path = f"\033[9m{formatted_path}\033[0m"
+                if ph.path_alias_for:
+                    # Just an alias; if valid/accessible,
+                    # process canonical one next
+                    formatted_path += \
+                        f"\033[0m (alias for \033[3m{ph.path_alias_for})"
+                    if response_code not in [403, 410]:
+                        ph.path = ph.path_alias_for
+                        ph.path_alias_for = None
+                        if await ph.process() == 201:
+                            # Signal 201 if either path is new for the user
+                            response_code = 201
+                if ph.progress_changed:
+                    await bump_progress_version(
+                        ph.riddle_alias, ph.user.name, ph.changed_levels
+                    )
+    except Exception:
+        # Cached progress may hold writes which have just been rolled back
+        forget_player_progress(ph.riddle_alias, ph.user.name)
+        for level_hits in ph.taken_level_hits:
+            hit_counters.restore_level_hits(*level_hits)
+        raise
+
+    # Only now reflect recorded pages on page indexes
+    for path in ph.visited_pages:
+        update_page_data(ph.riddle_alias, path, visited=True)
+    if ph.pages_added:
+        # Have other workers reload theirs (this one's is updated in place)
+        await page_index.invalidate(ph.riddle_alias, others_only=True)
+
+    # Only now count hit and let bot know of any unlocks
+    if ph.hit_counted:
+        hit_counters.add_hit(ph.riddle_alias, ph.user.name, ph.hit_level)
+        ph.riddle_account['hit_counter'] += 1
+    bot_outbox.wake()
 
     tnow = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
     match response_code:
@@ -128,14 +425,10 @@ async def process_url(
                 f"from \033[1m{ph.user.name}\033[0m "
                 f"({tnow})"
             )
-            return jsonify({
+            return {
                 'message': 'Locked level page',
                 'riddle': ph.riddle_alias,
-                'riddleData': await get_user_riddle_data(
-                    ph.riddle_alias, as_json=False
-                ),
-                'pagesData': await get_pages(ph.riddle_alias, as_json=False),
-            }), 403
+            }, 403, ph
         case 404:
             # Plain folder without index (403), or page not found (300/404)
             print(
@@ -144,22 +437,22 @@ async def process_url(
                 f"from \033[1m{ph.user.name}\033[0m "
                 f"({tnow})"
             )
-            return jsonify({
+            return {
                 'message': 'Page not found',
                 'riddle': ph.riddle_alias
-            }), 404
+            }, 404, None
         case 410:
             # Faulty 404s (e.g missing `/favicon.ico`); avoid polluting logs
-            return jsonify({
+            return {
                 'message': 'Page intentionally discarded',
                 'riddle': ph.riddle_alias
-            }), 410
+            }, 410, None
         case 412:
             # Page exists, but not a level one (yet?)
-            return jsonify({
+            return {
                 'message': 'Not a level page',
                 'riddle': ph.riddle_alias
-            }), 412
+            }, 412, None
 
     # Valid reachable level page
     # (201 if first access from user, 200 otherwise)
@@ -171,20 +464,65 @@ async def process_url(
         f"from \033[1m{ph.user.name}\033[0m "
         f"({tnow})"
     )
-    data = {
-        'riddle': ph.riddle_alias,
-        'setName': ph.path_level_set,
-        'levelName': ph.path_level,
-        'path': ph.path,
-        'riddleData': await get_user_riddle_data(ph.riddle_alias, as_json=False),
-        'pagesData': await get_pages(ph.riddle_alias, as_json=False),
-    }
-    if await has_unlocked_path_credentials(
-        ph.riddle_alias, user, path_credentials['path']
-    ):
-        data |= {'unlockedCredentials': path_credentials}
+    with stage_timings.measure('response', ph.riddle_alias):
+        data = {
+            'riddle': ph.riddle_alias,
+            'setName': ph.path_level_set,
+            'levelName': ph.path_level,
+            'path': ph.path,
+        }
+        if await has_unlocked_path_credentials(
+            ph.riddle_alias, ph.user, path_credentials['path']
+        ):
+            data |= {'unlockedCredentials': path_credentials}
+
+    return data, response_code, ph
+
+
+async def _get_progress_data(
+    ph: '_PathHandler', known_version: str | None = None
+) -> dict:
+    '''
+    Return player's riddle and pages data,
+    unless the version already known by the extension is still current.
+    If only some levels' pages have changed since then (as far as this
+    worker knows), send just those under `changedPagesData` instead.
+    '''
+
+    alias = ph.riddle_alias
+    with stage_timings.measure('progress_data', alias):
+        progress_version = await get_progress_version(alias, ph.user.name)
+        indexes_version = \
+            f"{page_index.version(alias)}.{level_index.version(alias)}"
+        version = f"{progress_version}.{indexes_version}"
+        if known_version == version:
+            return {'progressVersion': version, 'unchanged': True}
+
+        known_progress_version, _, known_indexes_version = \
+            (known_version or '').partition('.')
+        if (
+            known_indexes_version == indexes_version
+            and known_progress_version.isdigit()
+        ):
+            changed_levels = get_changed_levels(
+                alias, ph.user.name,
+                int(known_progress_version), progress_version,
+            )
+            if changed_levels is not None:
+                return {
+                    'progressVersion': version,
+                    'riddleData':
+                        await get_user_riddle_data(alias, as_json=False),
+                    'changedPagesData': await get_pages(
+                        alias, only_levels=changed_levels, as_json=False
+                    ),
+                }
 
-    return jsonify(data), response_code
+        return {
+            'progressVersion': version,
+            'riddleData': await get_user_riddle_data(alias, as_json=False),
+            'pagesData': await get_pages(alias, as_json=False),
+        }
 
 
 class _PathHandler:
@@ -202,6 +540,9 @@ class _PathHandler:
     riddle_account: dict
     '''Dict containing player's riddle account info from DB.'''
 
+    progress: PlayerProgress
+    '''Player's (cached) riddle progress, updated in place on writes.'''
+
     path: str
     '''Path to be processed by handler.'''
 
@@ -220,6 +561,30 @@ class _PathHandler:
     status_code: int
     '''Real status code of requested page (either 200 or 404).'''
 
+    progress_changed: bool
+    '''Whether player's riddle/pages data has been changed by the hit.'''
+
+    changed_levels: set[str]
+    '''Levels whose pages data has been changed by the hit.'''
+
+    user_levels: dict[str, bool] | None
+    '''Player's `{level_name: is_solved}` found levels (once fetched).'''
+
+    hit_counted: bool
+    '''Whether hit is to be counted (on actual navigation or 404s).'''
+
+    hit_level: str | None
+    '''Level hit is to be counted for (if any).'''
+
+    taken_level_hits: list[tuple[str, str, str, int]]
+    '''Unflushed level hits written along with completions, if any.'''
+
+    visited_pages: list[str]
+    '''Paths to be marked as visited in the page index (once committed).'''
+
+    pages_added: bool
+    '''Whether new pages have been recorded (i.e page indexes are stale).'''
+
     @classmethod
     async def build(
         cls,
@@ -233,11 +598,23 @@ class _PathHandler:
 
         # Parse and save basic data + status code
         self = cls()
+        start = time.perf_counter()
         await self._parse_riddle_data_from_url(url)
         if not self.riddle:
             return None
+        stage_timings.record(
+            'riddle', self.riddle_alias, time.perf_counter() - start
+        )
         self.user = user
         self.path = self.raw_path
+        self.progress_changed = False
+        self.changed_levels = set()
+        self.user_levels = None
+        self.hit_counted = False
+        self.hit_level = None
+        self.taken_level_hits = []
+        self.visited_pages = []
+        self.pages_added = False
         self.status_code = status_code
 
         # Always ignore occurrences of consecutive slashes
@@ -253,18 +630,26 @@ class _PathHandler:
 
         if not self.short_run and status_code is not None:
             # Valid non-trivial path; format it in accordance to the guidelines
-            await self._format_and_sanitize_path()
+            # (just once for every player visiting the same raw path)
+            raw_path = self.path
+            if canonical_path := await get_canonical_path(
+                self.riddle_alias, raw_path, status_code
+            ):
+                self.path = canonical_path
+            else:
+                with stage_timings.measure('canonical', self.riddle_alias):
+                    await self._format_and_sanitize_path()
+                if self.path_comparable:
+                    set_canonical_path(
+                        self.riddle_alias, raw_path, status_code, self.path
+                    )
 
         # Mark whether page came from actual top-level navigation
         self.navigated = request_type == 'main_frame'
 
         # If applicable, retrieve path alias info
-        query = '''
-            SELECT alias_for FROM level_pages
-            WHERE riddle = :riddle AND path = :path
-        '''
-        values = {'riddle': self.riddle_alias, 'path': self.path}
-        self.path_alias_for = await database.fetch_val(query, values)
+        page = await get_page_data(self.riddle_alias, self.path)
+        self.path_alias_for = page['alias_for'] if page else None
 
         return self
 
@@ -292,37 +677,12 @@ class _PathHandler:
             path = f"/{'/'.join((['..'] * parent_count) + suffix_tokens)}"
             return path
 
-        def _url_matches_root(parsed_root: SplitResult) -> bool:
-            if '*' in urlunsplit(parsed_root):
-                # Wildcard root path; ignore host pages outside given pattern
-                pattern = (
-                    f"{parsed_root.hostname}{parsed_root.path}"
-                    .replace('.', r'\.').replace('*', r'.*')
-                )
-                host_and_path = f"{parsed_url.hostname}{parsed_url.path}"
-                return re.fullmatch(pattern, host_and_path)
-
-            # Single root path
-            return parsed_root.hostname == parsed_url.hostname
-
-        # Build dict of {root_path: riddle}
-        riddles = await get_riddles(unlisted=True)
-        root_paths = {}
-        for riddle in riddles:
-            try:
-                for root_path in json.loads(riddle['root_path']):
-                    root_paths |= {root_path: riddle}
-            except json.decoder.JSONDecodeError:
-                root_paths |= {riddle['root_path']: riddle}
-
         # Search for riddle with matching root path (if any)
-        for root_path, riddle in reversed(root_paths.items()):
-            parsed_root = urlsplit(root_path.replace('://www.', '://'))
-            if _url_matches_root(parsed_root):
-                break
-        else:
+        router = await _root_path_router.get()
+        if not (match := router.match(parsed_url)):
             self.riddle = None
             return
+        riddle, root_path, parsed_root = match
 
         # Save riddle and parsed URL data
         self.riddle = riddle | {'root_path': root_path}
@@ -342,8 +702,8 @@ class _PathHandler:
         async def _format(base_path: str):
             '''Format path if suitable (i.e indeed not unique).'''
 
-            async def _request_page(path: str) -> requests.Response:
-                '''Build suitable request, send it, and return its response.'''
+            async def _get_page_hash(path: str) -> str | None:
+                '''Build suitable request URL and return page's content hash.'''
                 url = f"{self.riddle['root_path']}{path}"
                 credentials = await get_path_credentials(self.riddle_alias, path)
                 if credentials['username'] and credentials['password']:
@@ -357,22 +717,14 @@ class _PathHandler:
                         url = url.replace('://', f"://{auth}@")
                 url = re.sub(r'^([^?]+)[?]$', r'\1?_=', url)  # handle empty query
                 cookies = {'s': 'eGNIqq1R'}
-                return requests.get(url, cookies=cookies, timeout=5)
+                return await get_content_hash(url, cookies=cookies)
 
-            query = '''
-                SELECT 1 FROM level_pages
-                WHERE riddle = :riddle AND path = :path
-            '''
-            values = {'riddle': self.riddle_alias, 'path': self.path}
-            if await database.fetch_val(query, values):
+            if await get_page_data(self.riddle_alias, self.path):
                 # Given path is unique and has been recorded before
                 return
 
             # Retrieve given page's hash directly from the website
-            content_hash = None
-            res = await _request_page(self.path)
-            if res.ok:
-                content_hash = hashlib.md5(res.content).hexdigest()
+            content_hash = await _get_page_hash(self.path)
 
             query = '''
                 SELECT content_hash
@@ -391,12 +743,14 @@ class _PathHandler:
             current_hash = await database.fetch_val(query, values)
             if not current_hash:
                 # Base path hasn't been recorded, retrieve it if available
-                res = await _request_page(base_path)
-                if res.ok:
-                    current_hash = hashlib.md5(res.content).hexdigest()
+                current_hash = await _get_page_hash(base_path)
+            if not (content_hash and current_hash):
+                # Don't keep outcome around, as page(s) may be back soon
+                self.path_comparable = False
 
             # Replace path iff both pages are available and the content matches
-            if content_hash == current_hash:
+            # (unavailable ones, e.g on host timeouts, can't be compared)
+            if content_hash and content_hash == current_hash:
                 self.path = base_path
 
         async def _get_base_query_page(main_path: str) -> dict | None:
@@ -409,20 +763,14 @@ class _PathHandler:
                     value in [self.parsed_query[param], '*']
                 )
 
-            query = """
-                SELECT * FROM level_pages
-                WHERE riddle = :riddle AND path LIKE :path                
-            """
-            values = {'riddle': self.riddle_alias, 'path': f"{main_path}?%"}
-            query_pages = await database.fetch_all(query, values)
-            for query_page in reversed(query_pages):
-                query_string = query_page['path'].partition('?')[-1]
-                parsed_query = parse_qsl(query_string)                
+            query_pages = await get_query_pages(self.riddle_alias, main_path)
+            for query_page, parsed_query in query_pages:
                 if all(_matches(*item) for item in parsed_query):
                     return query_page
 
             return None
 
+        self.path_comparable = True
         self.path = self.path.partition('?')[0]
         if self.riddle['html_extension']:
             if self.path.endswith(('/', '/..')):
@@ -478,13 +826,18 @@ class _PathHandler:
     async def build_player_riddle_data(self):
         '''Build player riddle data from DB, creating it if nonexistent.'''
 
-        # Possibly create brand new riddle account
-        query = '''
-            INSERT IGNORE INTO riddle_accounts (riddle, username)
-            VALUES (:riddle, :username)
-        '''
-        values = {'riddle': self.riddle_alias, 'username': self.user.name}
-        await database.execute(query, values)
+        alias, username = self.riddle_alias, self.user.name
+        values = {'riddle': alias, 'username': username}
+        if not (progress := await get_player_progress(alias, username)):
+            # Create brand new riddle account
+            query = '''
+                INSERT IGNORE INTO riddle_accounts (riddle, username)
+                VALUES (:riddle, :username)
+            '''
+            if await database.execute(query, values):
+                # Start off with all levels/cheevos left for mastery
+                await recount_mastery_counts(alias, username)
+            progress = await get_player_progress(alias, username)
         if await is_user_incognito():
             # Possibly likewise create incognito accounts
             query = '''
@@ -496,41 +849,40 @@ class _PathHandler:
                 INSERT IGNORE INTO _incognito_accounts (username)
                 VALUES (:username)
             '''
-            await database.execute(query, {'username': self.user.name})
+            await database.execute(query, {'username': username})
 
-        # Fetch player riddle data
-        query = '''
-            SELECT * FROM riddle_accounts
-            WHERE riddle = :riddle AND username = :username
-        '''
-        self.riddle_account = dict(await database.fetch_one(query, values))
-        query = '''
-            SELECT current_level FROM _incognito_riddle_accounts
-            WHERE riddle = :riddle AND username = :username
-        '''
-        if await database.fetch_val(query, values) == '🏅':
-            # TODO, temp fix
-            self.riddle_account['current_level'] = '🏅'
+        # Use (cached) player riddle data, to be updated in place
+        self.progress = progress
+        self.riddle_account = progress.riddle_account
+        self.user_levels = progress.levels
 
         # Update current riddle being played
-        query = '''
-            UPDATE accounts SET current_riddle = :riddle
-            WHERE username = :username
-        '''
-        await database.execute(query, values)
+        account = await get_session_context().get_account()
+        if not account or account['current_riddle'] != alias:
+            query = '''
+                UPDATE accounts SET current_riddle = :riddle
+                WHERE username = :username
+            '''
+            await database.execute(query, values)
+            if account:
+                account['current_riddle'] = alias
 
     async def process(self) -> bool:
         '''Process level path.'''
 
         # Fetch page data (if existing)
-        query = '''
-            SELECT lp.*, up.username
-            FROM level_pages lp LEFT JOIN user_pages up
-                ON lp.riddle = up.riddle AND lp.path = up.path
-            WHERE lp.riddle = :riddle AND lp.path = :path
-        '''
-        values = {'riddle': self.riddle_alias, 'path': self.path}
-        page = dict(await database.fetch_one(query, values) or {})
+        page = dict(await get_page_data(self.riddle_alias, self.path) or {})
+        if page and not page['visited']:
+            # Page might have been visited since index was built
+            query = '''
+                SELECT 1 FROM user_pages
+                WHERE riddle = :riddle AND path = :path
+                LIMIT 1
+            '''
+            values = {'riddle': self.riddle_alias, 'path': self.path}
+            if await database.fetch_val(query, values):
+                page['visited'] = True
+                update_page_data(self.riddle_alias, self.path, visited=True)
         self.hidden = bool(page.get('hidden'))
         self.removed = bool(page.get('removed'))
         self.special = bool(page.get('special'))
@@ -540,11 +892,11 @@ class _PathHandler:
             lh = _LevelHandler(answer_level, self)
             await lh.register_completion()
 
-        if not page or (not page['username'] and not self.removed):
+        if not page or (not page['visited'] and not self.removed):
             if self.status_code in [300, 403, 404]:
                 # 404-like (and not e.g unlisted page);
                 # should still increment all hit counters
-                await self._update_hit_counters()
+                self._count_hit()
 
                 # Unformat path for logging purposes
                 self.path = self.raw_path
@@ -563,13 +915,8 @@ class _PathHandler:
             # Look out for "special" achievements that aren't part of any level
             await self._process_achievement()
 
-        # Get requested page's level info from DB
-        query = '''
-            SELECT * FROM levels
-            WHERE riddle = :riddle AND name = :level_name
-        '''
-        values = {'riddle': self.riddle_alias, 'level_name': page['level_name']}
-        level = await database.fetch_one(query, values)
+        # Get requested page's level info
+        level = await get_level_data(self.riddle_alias, page['level_name'])
         self.path_level = level and level['name']
         self.path_level_set = level and level['level_set']
         if level and level['path']:
@@ -578,18 +925,7 @@ class _PathHandler:
                 await self._check_and_unlock(level)
 
         # Check if level has been unlocked (right now or beforehand)
-        query = '''
-            SELECT 1 FROM user_levels
-            WHERE riddle = :riddle
-                AND level_name = :level_name
-                AND username = :username
-        '''
-        values = {
-            'riddle': self.riddle_alias,
-            'level_name': self.path_level,
-            'username': self.user.name,
-        }
-        if await database.fetch_val(query, values):
+        if self.path_level in await self.get_user_levels():
             if self.navigated:
                 # Mark level/page currently being visited
                 query = '''
@@ -598,15 +934,22 @@ class _PathHandler:
                         last_visited_page = :path
                     WHERE riddle = :riddle AND username = :username
                 '''
-                values |= {'path': self.path}
+                values = {
+                    'riddle': self.riddle_alias,
+                    'level_name': self.path_level,
+                    'username': self.user.name,
+                    'path': self.path,
+                }
                 await database.execute(query, values)
+                self.riddle_account['last_visited_level'] = self.path_level
+                self.riddle_account['last_visited_page'] = self.path
         elif not await self._are_level_requirements_satisfied(self.path_level):
             # Level not unlocked and can't access yet pages from it
             return 403
 
         if self.navigated and not self.path_alias_for:
             # Update all hit counters on actual navigation
-            await self._update_hit_counters()
+            self._count_hit()
 
         # Register new page access in database (if applicable)
         is_new_page = await self._process_page()
@@ -623,35 +966,44 @@ class _PathHandler:
             # Ignore old/removed answers
             return None
 
+        answered_levels = \
+            await get_answered_levels(self.riddle_alias, self.path)
+        if not answered_levels:
+            # Not an answer to any level at all
+            return None
+
         # Search for unlocked but unsolved levels
-        query = '''
-            SELECT is_secret, `index`, name, latin_name,
-                answer, `rank`, discord_name
-            FROM user_levels INNER JOIN levels
-            ON levels.riddle = user_levels.riddle
-                AND levels.name = user_levels.level_name
-            WHERE user_levels.riddle = :riddle
-                AND username = :username
-                AND completion_time IS NULL
-        '''
-        values = {
-            'riddle': self.riddle_alias,
-            'username': self.user.name
+        current_levels = {
+            level_name
+            for level_name, solved in (await self.get_user_levels()).items()
+            if not solved
         }
-        current_levels = await database.fetch_all(query, values)
 
-        # Register completion if path is answer to any of the
-        # unlocked levels (bar removed page cases)
-        for level in current_levels:
-            try:
-                is_answer = self.path in json.loads(level['answer'] or '')
-            except json.decoder.JSONDecodeError:
-                is_answer = self.path == level['answer']
-            if is_answer:
-                return level
+        # Register completion if path is answer to any of the unlocked levels
+        for level in answered_levels:
+            if level['name'] in current_levels:
+                fields = (
+                    'is_secret', 'index', 'name', 'latin_name',
+                    'answer', 'rank', 'discord_name',
+                )
+                return {field: level[field] for field in fields}
 
         return None
 
+    async def get_user_levels(self) -> dict[str, bool]:
+        '''Return (and keep) player's found levels and whether solved.'''
+        if self.user_levels is None:
+            query = '''
+                SELECT level_name, completion_time FROM user_levels
+                WHERE riddle = :riddle AND username = :username
+            '''
+            values = {'riddle': self.riddle_alias, 'username': self.user.name}
+            self.user_levels = {
+                row['level_name']: row['completion_time'] is not None
+                for row in await database.fetch_all(query, values)
+            }
+        return self.user_levels
+
     async def _are_level_requirements_satisfied(self, level_name: str) -> bool:
         '''
         Check if all required levels are already beaten
@@ -662,34 +1014,14 @@ class _PathHandler:
             # Always record removed pages
             return True
 
-        query = '''
-            SELECT * FROM level_requirements
-            WHERE riddle = :riddle AND level_name = :level_name
-        '''
-        values = {'riddle': self.riddle_alias, 'level_name': level_name}
-        level_requirements = await database.fetch_all(query, values)
-        for req in level_requirements:
-            completion_cond = (
-                '' if req['finding_is_enough']
-                else 'AND completion_time IS NOT NULL'
-            )
-            query = f"""
-                SELECT 1 FROM user_levels
-                WHERE riddle = :riddle
-                    AND level_name = :level_name
-                    AND username = :username
-                    {completion_cond}
-            """
-            values = {
-                'riddle': self.riddle_alias,
-                'level_name': req['requires'],
-                'username': self.user.name,
-            }
-            req_satisfied = await database.fetch_val(query, values)
-            if not req_satisfied:
-                return False
-
-        return True
+        user_levels = await self.get_user_levels()
+        requirements = \
+            await get_level_requirements(self.riddle_alias, level_name)
+        return all(
+            req['requires'] in user_levels and
+            (req['finding_is_enough'] or user_levels[req['requires']])
+            for req in requirements
+        )
 
     async def _check_and_unlock(self, level: dict):
         '''Check if a level hasn't been AND can be unlocked.
@@ -700,69 +1032,24 @@ class _PathHandler:
             return
 
         # Check if level has already been unlocked beforehand
-        query = '''
-            SELECT * FROM user_levels
-            WHERE riddle = :riddle
-                AND level_name = :level_name
-                AND username = :username
-        '''
-        values = {
-            'riddle': self.riddle_alias,
-            'level_name': level['name'],
-            'username': self.user.name,
-        }
-        already_unlocked = await database.fetch_one(query, values)
-        if already_unlocked:
+        if level['name'] in await self.get_user_levels():
             return
 
         # A new level has been found!
         lh = _LevelHandler(level, self)
         await lh.register_finding()
 
-    async def _update_hit_counters(self):
-        '''Update player, riddle and level hit counters.'''
-
-        # Update riddle/account hit counters
-        query = '''
-            UPDATE riddles SET hit_counter = hit_counter + 1
-            WHERE alias = :alias
+    def _count_hit(self):
         '''
-        await database.execute(query, {'alias': self.riddle_alias})
-        query = '''
-            UPDATE accounts SET global_hit_counter = global_hit_counter + 1
-            WHERE username = :username
-        '''
-        await database.execute(query, {'username': self.user.name})
-        query = '''
-            UPDATE riddle_accounts SET hit_counter = hit_counter + 1
-            WHERE riddle = :riddle AND username = :username
+        Have player, riddle and level hit counters updated
+        (only once progress is committed).
         '''
-        values = {'riddle': self.riddle_alias, 'username': self.user.name}        
-        await database.execute(query, values)
 
-        # Check last level visited by player (which can be the current).
+        # Last level visited by player (which can be the current).
         # All subsequent 404 pages are counted as part of given level,
         # until player visits a new valid level page.
-        query = '''
-            SELECT * FROM riddle_accounts
-            WHERE riddle = :riddle AND username = :username
-        '''
-        last_visited_level = await database.fetch_val(
-            query, values, 'last_visited_level'
-        )
-        if last_visited_level:
-            # Increment completion access count for unbeaten levels
-            # (if level has already been completed, nothing happens).
-            query = '''
-                UPDATE user_levels
-                SET completion_hit_counter = completion_hit_counter + 1
-                WHERE riddle = :riddle
-                    AND username = :username
-                    AND level_name = :level_name
-                    AND completion_time IS NULL
-            '''
-            values['level_name'] = last_visited_level
-            await database.execute(query, values)
+        self.hit_counted = True
+        self.hit_level = self.riddle_account['last_visited_level']
 
     async def update_score(self, points: int):
         '''Record player score increase, by given points, in DB.'''
@@ -783,6 +1070,9 @@ class _PathHandler:
             'username': self.user.name,
         }
         await database.execute(query, values)
+        if not incognito:
+            self.riddle_account['score'] += points
+            self.riddle_account['recent_score'] += points
 
         # Increase global score (unless riddle is unlisted)
         if not self.unlisted:
@@ -818,7 +1108,13 @@ class _PathHandler:
             'time': tnow,
             'incognito': await is_user_incognito(),
         }
-        if not await database.execute(query, values):
+        is_new_page = (
+            self.path not in self.progress.pages
+            and bool(await database.execute(query, values))
+        )
+        self.progress.pages.add(self.path)
+        self.visited_pages.append(self.path)
+        if not is_new_page:
             # Page's already there, so just update it
             # (account for NULL level records granted a priori)
             query = '''
@@ -835,6 +1131,14 @@ class _PathHandler:
             return False
 
         # New page; unless hidden, update player's riddle data
+        # (page may also reveal the answer of other levels)
+        self.progress_changed = True
+        if self.path_level:
+            self.changed_levels.add(self.path_level)
+        self.changed_levels.update(
+            level['name'] for level in
+            await get_answered_levels(self.riddle_alias, self.path)
+        )
         if not self.hidden:
             query = f"""
                 UPDATE {
@@ -848,6 +1152,9 @@ class _PathHandler:
             del values['path']
             del values['incognito']
             await database.execute(query, values)
+            if not await is_user_incognito():
+                self.riddle_account['page_count'] += 1
+                self.riddle_account['last_page_time'] = tnow
 
         return True
 
@@ -855,33 +1162,28 @@ class _PathHandler:
         '''Grant cheevo and awards if page is an achievement one.'''
 
         # Check if it's an achievement page
-        query = '''
-            SELECT * FROM achievements
-            WHERE riddle = :riddle
-                AND JSON_CONTAINS(paths_json, :path, "$.paths")
-        '''
-        values = {'riddle': self.riddle_alias, 'path': (f"\"{self.path}\"")}
-        achievement = await database.fetch_one(query, values)
-        if not achievement:
+        achievements = await get_path_cheevos(self.riddle_alias, self.path)
+        if not achievements:
             return
+        achievement = achievements[0]
 
         paths_json = json.loads(achievement['paths_json'])
         if 'operator' in paths_json and paths_json['operator'] == 'AND':
             # If an 'AND' operator, all cheevo pages must have been found
-            for path in paths_json['paths']:
-                query = '''
-                    SELECT 1 FROM user_pages
-                    WHERE riddle = :riddle
-                        AND username = :username
-                        AND path = :path
-                '''
-                values = {
-                    'riddle': self.riddle_alias,
-                    'username': self.user.name,
-                    'path': path,
-                }
-                if not await database.fetch_val(query, values):
-                    return
+            paths = set(paths_json['paths'])
+            placeholders = ', '.join(f":path{i}" for i in range(len(paths)))
+            query = f"""
+                SELECT COUNT(*) FROM user_pages
+                WHERE riddle = :riddle
+                    AND username = :username
+                    AND path IN ({placeholders})
+            """
+            values = {
+                'riddle': self.riddle_alias,
+                'username': self.user.name,
+            } | {f"path{i}": path for i, path in enumerate(paths)}
+            if await database.fetch_val(query, values) < len(paths):
+                return
 
         # If positive, add it to the player's collection
         query = '''
@@ -904,8 +1206,7 @@ class _PathHandler:
         await self.update_score(points)
 
         # Call bot achievement unlock procedures
-        await bot_request(
-            'unlock',
+        await self.notify_bot(
             method='cheevo_found',
             alias=self.riddle_alias,
             username=self.user.name,
@@ -920,17 +1221,38 @@ class _PathHandler:
             f"\033[1m{self.user.name}\033[0m unlocked achievement "
             f"\033[1m\033[3m{achievement['title']}\033[0m\033[0m"
         )
+        self.progress_changed = True
+        await self.decrement_mastery_count('cheevos')
         if await has_player_mastered_riddle(self.riddle_alias, self.user.name):
             await self.grant_mastery()
 
+    async def decrement_mastery_count(self, kind: str):
+        '''Account for one less level/cheevo left for player's mastery.'''
+        incognito = await is_user_incognito()
+        await decrement_mastery_count(
+            self.riddle_alias, self.user.name, kind, incognito=incognito
+        )
+        columns = [f"{kind}_remaining"]
+        if not incognito:
+            columns.append(f"visible_{kind}_remaining")
+        for column in columns:
+            if self.riddle_account[column] is None:
+                # Counts have just been computed from scratch in DB
+                forget_player_progress(self.riddle_alias, self.user.name)
+            elif self.riddle_account[column]:
+                self.riddle_account[column] -= 1
+
+    async def notify_bot(self, **kwargs):
+        '''Enqueue bot unlock call (sent after progress is committed).'''
+        await bot_outbox.append(self.user.name, 'unlock', **kwargs)
+
     async def grant_mastery(self):
         '''Log and message player mastering the riddle (i.e 100% score).'''
         print(
             f"> \033[1m[{self.riddle_alias}]\033[0m "
             f"\033[1m{self.user.name}\033[0m has mastered the game 💎"
         )
-        await bot_request(
-            'unlock',
+        await self.notify_bot(
             method='game_mastered',
             alias=self.riddle_alias,
             username=self.user.name,
@@ -946,6 +1268,8 @@ class _PathHandler:
         '''
         values = {'riddle': self.riddle_alias, 'path': self.path}
         if await database.execute(query, values):
+            self.pages_added = True
+
             # Record found page and the user who did it
             query = '''
                 INSERT IGNORE INTO _found_pages 
@@ -977,6 +1301,75 @@ class _PathHandler:
             'incognito': await is_user_incognito(),
         }
         await database.execute(query, values)
+        self.visited_pages.append(self.path)
+
+
+class _RootPathRouter:
+    '''Index of riddle root paths, for matching URLs to their riddles.'''
+
+    entries_by_host: dict[str, list[tuple]]
+    '''
+    Dict of `{hostname: [entries]}`, with each entry being a tuple of
+    `(priority, root_path, parsed_root, riddle, pattern)`.
+    '''
+
+    glob_host_entries: list[tuple]
+    '''Same kind of entries, but for wildcard hostnames (e.g `*.host.com`).'''
+
+    @classmethod
+    async def build(cls) -> Self:
+        '''Build router from every (listed or unlisted) riddle.'''
+
+        # Build dict of {root_path: riddle}
+        riddles = await get_riddles(unlisted=True)
+        root_paths = {}
+        for riddle in riddles:
+            try:
+                for root_path in json.loads(riddle['root_path']):
+                    root_paths |= {root_path: riddle}
+            except json.decoder.JSONDecodeError:
+                root_paths |= {riddle['root_path']: riddle}
+
+        # Index root paths by host, with later ones taking precedence
+        self = cls()
+        self.entries_by_host, self.glob_host_entries = {}, []
+        for priority, (root_path, riddle) in enumerate(
+            reversed(root_paths.items())
+        ):
+            parsed_root = urlsplit(root_path.replace('://www.', '://'))
+            pattern = None
+            if '*' in urlunsplit(parsed_root):
+                # Wildcard root path; ignore host pages outside given pattern
+                pattern = re.compile(
+                    f"{parsed_root.hostname}{parsed_root.path}"
+                    .replace('.', r'\.').replace('*', r'.*')
+                )
+            entry = (priority, root_path, parsed_root, riddle, pattern)
+            if '*' in (parsed_root.hostname or ''):
+                self.glob_host_entries.append(entry)
+            else:
+                self.entries_by_host \
+                    .setdefault(parsed_root.hostname, []).append(entry)
+
+        return self
+
+    def match(self, parsed_url: SplitResult) -> tuple | None:
+        '''Return `(riddle, root_path, parsed_root)` matching URL, if any.'''
+
+        entries = self.entries_by_host.get(parsed_url.hostname, [])
+        if self.glob_host_entries:
+            entries = sorted(entries + self.glob_host_entries)
+        host_and_path = f"{parsed_url.hostname}{parsed_url.path}"
+        for _, root_path, parsed_root, riddle, pattern in entries:
+            if not pattern or pattern.fullmatch(host_and_path):
+                return riddle, root_path, parsed_root
+
+        return None
+
+
+# Riddles are seldom changed (and only directly through the DB)
+_root_path_router = \
+    RiddleCache('root_path_router', _RootPathRouter.build, ttl=60)
 
 
 class _LevelHandler:
@@ -1016,10 +1409,14 @@ class _LevelHandler:
             'incognito_unlock': await is_user_incognito(),
         }
         await database.execute(query, values)
+        self.ph.progress_changed = True
+        self.ph.changed_levels.add(self.level['name'])
+        if self.ph.user_levels is not None:
+            self.ph.user_levels[self.level['name']] = False
 
         # Call bot unlocking procedure
-        await bot_request(
-            'unlock', method='advance',
+        await self.ph.notify_bot(
+            method='advance',
             alias=self.ph.riddle_alias,
             level=self.level,
             username=self.ph.user.name,
@@ -1058,13 +1455,28 @@ class _LevelHandler:
         # Check if level is unlocked AND unbeaten
         row = await self._get_user_level_row()
         if not row or row['completion_time']:
+            # Cached levels disagree with DB (e.g level solved meanwhile
+            # on another worker); sync them, lest the same level be found
+            # again, and have progress reloaded on the next hit
+            if self.ph.user_levels is not None:
+                if row:
+                    self.ph.user_levels[self.level['name']] = True
+                else:
+                    self.ph.user_levels.pop(self.level['name'], None)
+            forget_player_progress(self.ph.riddle_alias, self.ph.user.name)
             return False
 
         # Register level completion on designated table
+        # (also counting level hits still pending in memory)
         alias, username = self.ph.riddle_alias, self.ph.user.name
+        hits = hit_counters.take_level_hits(alias, username, self.level['name'])
+        self.ph.taken_level_hits.append(
+            (alias, username, self.level['name'], hits)
+        )
         query = '''
             UPDATE user_levels
-            SET completion_time = :time, incognito_solve = :incognito_solve
+            SET completion_time = :time, incognito_solve = :incognito_solve,
+                completion_hit_counter = completion_hit_counter + :hits
             WHERE riddle = :riddle
                 AND username = :username
                 AND level_name = :level
@@ -1075,12 +1487,16 @@ class _LevelHandler:
             'level': self.level['name'],
             'time': datetime.utcnow(),
             'incognito_solve': await is_user_incognito(),
+            'hits': hits,
         }
         await database.execute(query, values)
+        self.ph.progress_changed = True
+        self.ph.changed_levels.add(self.level['name'])
+        if self.ph.user_levels is not None:
+            self.ph.user_levels[self.level['name']] = True
 
         # Call bot level beat procedures
-        await bot_request(
-            'unlock',
+        await self.ph.notify_bot(
             method='beat',
             alias=alias,
             level=self.level,
@@ -1113,10 +1529,10 @@ class _LevelHandler:
             """
             values |= {'username': username}
             await database.execute(query, values)
+            self.ph.riddle_account['current_level'] = '🏅'
 
             # Call bot completion procedures
-            await bot_request(
-                'unlock',
+            await self.ph.notify_bot(
                 method='game_completed',
                 alias=alias,
                 username=username,
@@ -1128,6 +1544,10 @@ class _LevelHandler:
                 f"\033[1m{username}\033[0m has finished the game 🏅"
             )
 
+        if self.level['rank'] != 'F' or self.level['name'] == final_name:
+            # Ranked (or final) level; one less left for mastery
+            await self.ph.decrement_mastery_count('levels')
+
         # Assure level is ranked (points > 0) to avoid redundant mastery
         # logs/messages (i.e for post-100% unranked solves and 0-score riddles)
         if self.points and await has_player_mastered_riddle(alias, username):
@@ -1160,16 +1580,9 @@ class _LevelHandler:
 
         if not await is_user_incognito():
             # Update global user completion count
-            query = '''
-                UPDATE levels
-                SET completion_count = completion_count + 1
-                WHERE riddle = :riddle AND name = :level_name
-            '''
-            values = {
-                'riddle': self.ph.riddle_alias,
-                'level_name': self.level['name']
-            }
-            await database.execute(query, values)
+            await increment_counter(
+                LEVEL_COMPLETIONS, self.ph.riddle_alias, self.level['name']
+            )
 
         # Update user and global scores
         await self.ph.update_score(self.points)
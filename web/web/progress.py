@@ -0,0 +1,203 @@
+from collections import OrderedDict
+from sys import intern
+from typing import Iterable, Self
+
+from util.db import database
+
+MAX_CACHED_PLAYERS = 1024
+'''Maximum number of (player, riddle) progress entries kept in memory.'''
+
+MAX_TRACKED_CHANGES = 32
+'''Maximum number of (latest) version bumps whose changes are kept track of.'''
+
+
+class PlayerProgress:
+    '''
+    Player's riddle progress, as cached by this worker.
+
+    Entries are validated on use against `riddle_accounts.progress_version`,
+    so writers elsewhere (other workers, admin routines) just need to bump it.
+    '''
+
+    version: int
+    '''Progress version the data corresponds to.'''
+
+    riddle_account: dict
+    '''Player's `riddle_accounts` row.'''
+
+    levels: dict[str, bool]
+    '''Found levels, and whether each has been solved.'''
+
+    pages: set[str]
+    '''Paths of every page found by player.'''
+
+    credentials: set[str]
+    '''Paths of every credentials (realm) unlocked by player.'''
+
+    changes: dict[int, set[str] | None]
+    '''
+    Levels whose pages data changed with each version bump made by this
+    worker since loading (`None` meaning that possibly any of them did).
+    '''
+
+    @classmethod
+    async def load(cls, alias: str, username: str, version: int) -> Self:
+        '''Load player's riddle progress from DB.'''
+
+        self = cls()
+        self.version = version
+        self.changes = {}
+        values = {'riddle': alias, 'username': username}
+        query = '''
+            SELECT * FROM riddle_accounts
+            WHERE riddle = :riddle AND username = :username
+        '''
+        self.riddle_account = dict(await database.fetch_one(query, values))
+        query = '''
+            SELECT current_level FROM _incognito_riddle_accounts
+            WHERE riddle = :riddle AND username = :username
+        '''
+        if await database.fetch_val(query, values) == '🏅':
+            # TODO, temp fix
+            self.riddle_account['current_level'] = '🏅'
+
+        query = '''
+            SELECT level_name, completion_time FROM user_levels
+            WHERE riddle = :riddle AND username = :username
+        '''
+        self.levels = {
+            row['level_name']: row['completion_time'] is not None
+            for row in await database.fetch_all(query, values)
+        }
+        query = '''
+            SELECT path FROM user_pages
+            WHERE riddle = :riddle AND username = :username
+        '''
+        self.pages = {
+            intern(row['path'])
+            for row in await database.fetch_all(query, values)
+        }
+        query = '''
+            SELECT path FROM user_credentials
+            WHERE riddle = :riddle AND username = :username
+        '''
+        self.credentials = {
+            row['path'] for row in await database.fetch_all(query, values)
+        }
+
+        return self
+
+
+_progress_cache: OrderedDict[tuple[str, str], PlayerProgress] = OrderedDict()
+'''LRU cache of `{(riddle, username): progress}` pairs.'''
+
+
+async def get_player_progress(
+    alias: str, username: str
+) -> PlayerProgress | None:
+    '''
+    Return player's (possibly cached) riddle progress,
+    or `None` if they have no riddle account yet.
+    '''
+
+    # Navigation fields are written without bumping the version
+    # (so as not to have data resent on every visit), so read them anew
+    query = '''
+        SELECT progress_version, last_visited_level, last_visited_page
+        FROM riddle_accounts
+        WHERE riddle = :riddle AND username = :username
+    '''
+    values = {'riddle': alias, 'username': username}
+    row = await database.fetch_one(query, values)
+    if row is None:
+        return None
+    version = row['progress_version']
+
+    key = (alias, username)
+    if (progress := _progress_cache.get(key)) and progress.version == version:
+        _progress_cache.move_to_end(key)
+        for field in ('last_visited_level', 'last_visited_page'):
+            progress.riddle_account[field] = row[field]
+        return progress
+
+    progress = _progress_cache[key] = \
+        await PlayerProgress.load(alias, username, version)
+    _progress_cache.move_to_end(key)
+    if len(_progress_cache) > MAX_CACHED_PLAYERS:
+        _progress_cache.popitem(last=False)
+
+    return progress
+
+
+def peek_player_progress(alias: str, username: str) -> PlayerProgress | None:
+    '''Return player's cached progress if present (without validating it).'''
+    return _progress_cache.get((alias, username))
+
+
+def forget_player_progress(alias: str, username: str):
+    '''Drop player's cached progress (e.g after a failed write).'''
+    _progress_cache.pop((alias, username), None)
+
+
+async def bump_progress_version(
+    alias: str, username: str, levels: Iterable[str] | None = None
+):
+    '''
+    Signal that player's riddle/pages data has changed.
+        :param levels: Levels whose pages data changed
+            (if not given, possibly any of them).
+    '''
+    query = '''
+        UPDATE riddle_accounts
+        SET progress_version = progress_version + 1
+        WHERE riddle = :riddle AND username = :username
+    '''
+    await database.execute(query, {'riddle': alias, 'username': username})
+    if progress := _progress_cache.get((alias, username)):
+        # Cached data already has the changes written through it
+        # (should anyone else bump it meanwhile, versions won't match)
+        progress.version += 1
+        progress.changes[progress.version] = \
+            set(levels) if levels is not None else None
+        progress.changes.pop(progress.version - MAX_TRACKED_CHANGES, None)
+
+
+def get_changed_levels(
+    alias: str, username: str, since: int, version: int
+) -> set[str] | None:
+    '''
+    Return levels whose pages data changed from one version of player's
+    progress up to (current) other, or `None` if unknown (e.g changes
+    weren't made by this worker, or anything may have changed).
+    '''
+    progress = _progress_cache.get((alias, username))
+    if not progress or progress.version != version or since >= version:
+        return None
+
+    levels = set()
+    for _version in range(since + 1, version + 1):
+        if (changed := progress.changes.get(_version)) is None:
+            return None
+        levels |= changed
+
+    return levels
+
+
+async def bump_riddle_progress_versions(alias: str):
+    '''Signal that every riddle player's data may have changed.'''
+    query = '''
+        UPDATE riddle_accounts
+        SET progress_version = progress_version + 1
+        WHERE riddle = :riddle
+    '''
+    await database.execute(query, {'riddle': alias})
+
+
+async def get_progress_version(alias: str, username: str) -> int:
+    '''Return current version of player's riddle/pages data.'''
+    query = '''
+        SELECT progress_version FROM riddle_accounts
+        WHERE riddle = :riddle AND username = :username
+    '''
+    values = {'riddle': alias, 'username': username}
+    return await database.fetch_val(query, values) or 0
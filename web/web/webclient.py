@@ -1,10 +1,42 @@
+import asyncio
+from collections import OrderedDict
+import hashlib
 import json
+import re
+import time
 
 import aiohttp
 
+CONTENT_HASH_TTL = 30
+'''Time (in seconds) for which retrieved content hashes are reused.'''
+
+MAX_CONTENT_HASHES = 4096
+'''Maximum number of content hashes kept in memory.'''
+
+CONTENT_TIMEOUT = 5
+'''Time (in seconds) for a riddle host to accept/answer a page request.'''
+
+AUTH_TIMEOUT = 10
+'''Time (in seconds) for a riddle host to accept/answer an auth probe.'''
+
+_session: aiohttp.ClientSession | None = None
+'''Shared (pooled) HTTP session for requests to riddle hosts.'''
+
+_content_hashes: OrderedDict[str, tuple[float, str | None]] = OrderedDict()
+'''Recently retrieved `{url: (retrieval_time, content_hash)}` pairs.'''
+
+_pending_hashes: dict[str, asyncio.Task] = {}
+'''Ongoing content hash retrievals, by URL.'''
+
 
 async def bot_request(path: str, **kwargs) -> str:
     '''Send HTTP to webserver running on Discord bot.'''
+    _, text = await send_bot_request(path, **kwargs)
+    return text
+
+
+async def send_bot_request(path: str, **kwargs) -> tuple[int, str]:
+    '''Send HTTP to bot's webserver, returning status code and text.'''
 
     # Correctly prepare values to conforming JSON format
     url = 'http://localhost:4757/' + path
@@ -20,4 +52,101 @@ async def bot_request(path: str, **kwargs) -> str:
     async with aiohttp.ClientSession() as session:
         async with session.get(url, params=kwargs) as resp:
             text = await resp.text()
-            return text
+            return resp.status, text
+
+
+async def get_content_hash(
+    url: str, cookies: dict[str, str] | None = None
+) -> str | None:
+    '''
+    Retrieve page from riddle host and return its content's MD5 hash
+    (or `None` if unavailable), sharing recent and ongoing retrievals.
+    '''
+
+    if entry := _content_hashes.get(url):
+        retrieval_time, content_hash = entry
+        if time.monotonic() - retrieval_time < CONTENT_HASH_TTL:
+            return content_hash
+        del _content_hashes[url]
+
+    if not (task := _pending_hashes.get(url)):
+        # No one else waiting for this very page; send request ourselves
+        task = asyncio.create_task(_retrieve_content_hash(url, cookies))
+        task.add_done_callback(lambda _: _pending_hashes.pop(url, None))
+        _pending_hashes[url] = task
+
+    # Shield task so a cancelled waiter doesn't cancel it for the others
+    return await asyncio.shield(task)
+
+
+async def _retrieve_content_hash(
+    url: str, cookies: dict[str, str] | None
+) -> str | None:
+    '''Send request to riddle host and record its content hash.'''
+
+    content_hash = None
+    try:
+        async with _get_session().get(url, cookies=cookies) as res:
+            if res.ok:
+                content_hash = hashlib.md5(await res.read()).hexdigest()
+    except (aiohttp.ClientError, asyncio.TimeoutError):
+        # Unreachable/slow host; treat page as unavailable
+        pass
+
+    _content_hashes[url] = (time.monotonic(), content_hash)
+    while len(_content_hashes) > MAX_CONTENT_HASHES:
+        _content_hashes.popitem(last=False)
+
+    return content_hash
+
+
+async def get_auth_status(
+    url: str, auth: tuple[str, str] | None = None
+) -> tuple[int | None, str | None]:
+    '''
+    Request page from riddle host (possibly with basic auth credentials),
+    returning its status code (or `None` if unavailable)
+    and, if unauthorized, its realm message.
+    '''
+
+    basic_auth = aiohttp.BasicAuth(*auth) if auth else None
+    try:
+        timeout = aiohttp.ClientTimeout(
+            total=None, sock_connect=AUTH_TIMEOUT, sock_read=AUTH_TIMEOUT
+        )
+        async with _get_session().get(
+            url, auth=basic_auth, timeout=timeout
+        ) as res:
+            if res.status != 401:
+                return res.status, None
+            auth_header = res.headers.get('WWW-Authenticate', '')
+            match = re.search(r'realm="([^"]*)"', auth_header)
+            return 401, match[1] if match else None
+    except (aiohttp.ClientError, asyncio.TimeoutError):
+        # Unreachable/slow host
+        return None, None
+
+
+def _get_session() -> aiohttp.ClientSession:
+    '''Return shared HTTP session, creating it if needed.'''
+    global _session
+    if not _session or _session.closed:
+        _session = aiohttp.ClientSession(
+            # Don't let a single (slow) host hog all connections
+            connector=aiohttp.TCPConnector(limit=100, limit_per_host=4),
+            # Don't carry over cookies set by riddle hosts between players
+            cookie_jar=aiohttp.DummyCookieJar(),
+            # Time out on the host alone, not on waiting for a pooled
+            # connection (as requests may queue up under load)
+            timeout=aiohttp.ClientTimeout(
+                total=None, sock_connect=CONTENT_TIMEOUT,
+                sock_read=CONTENT_TIMEOUT,
+            ),
+        )
+    return _session
+
+
+async def close_session():
+    '''Close shared HTTP session (if open).'''
+    if _session and not _session.closed:
+        await _session.close()